@@ -0,0 +1,38 @@
+"""
+Helpers shared by the Metadata Discovery Agent (MDA) and Query Processing Agent (QP)
+"""
+
+import os
+import tempfile
+import orjson
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Reasoning tokens count against num_predict. gpt-oss cannot switch reasoning off, so it
+# runs at low effort with extra budget; other models are asked not to reason at all
+REASONING_HEADROOM = 512
+
+
+def think_setting(model_name: str):
+    """Value for the chat `think` argument: 'low' for gpt-oss, False for other models"""
+    return 'low' if model_name.startswith('gpt-oss') else False
+
+
+def load_cached_json(cache_file: Path) -> Optional[Dict[str, Any]]:
+    """Load a cached JSON entry, or None if missing or unreadable"""
+    try:
+        return orjson.loads(cache_file.read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+
+
+def save_cached_json(cache_file: Path, entry: Dict[str, Any], option: Optional[int] = None):
+    """Atomically write a JSON entry to the cache, serialized with the given orjson options"""
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_file.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(orjson.dumps(entry, option=option))
+        os.replace(tmp_path, cache_file)
+    except OSError as e:
+        print(f"  Warning: Could not cache {cache_file.name} - {str(e)}")
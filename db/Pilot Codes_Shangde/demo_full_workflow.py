@@ -3,7 +3,7 @@ Complete Two-Agent Workflow Demo
 Demonstrates the full pipeline: Scanner → MDA → QP
 """
 
-import json
+import orjson
 from pathlib import Path
 from metadata_scanner import MetadataScanner
 from mda_agent import MetadataDiscoveryAgent
@@ -34,8 +34,7 @@ def demo_full_workflow(data_directory: str = None, rescan: bool = False):
 
     if Path(metadata_file).exists() and not rescan:
         print(f"Using existing metadata file: {metadata_file}")
-        with open(metadata_file, 'r') as f:
-            metadata = json.load(f)
+        metadata = orjson.loads(Path(metadata_file).read_bytes())
     else:
         if rescan:
             print(f"Forcing rescan of directory: {data_directory}")
@@ -54,8 +53,7 @@ def demo_full_workflow(data_directory: str = None, rescan: bool = False):
 
     if Path(knowledge_base_file).exists():
         print(f"Using existing knowledge base: {knowledge_base_file}")
-        with open(knowledge_base_file, 'r') as f:
-            knowledge_base = json.load(f)
+        knowledge_base = orjson.loads(Path(knowledge_base_file).read_bytes())
     else:
         print("Analyzing metadata with AI agent (max 3 fields per dataset)...")
         mda = MetadataDiscoveryAgent(model_name="gpt-oss:20b", max_fields=3)
@@ -92,12 +90,13 @@ def demo_full_workflow(data_directory: str = None, rescan: bool = False):
     print(f"\nProcessing query: '{selected_query}'")
 
     qp = QueryProcessingAgent(
-        knowledge_base_file=knowledge_base_file,
+        knowledge_base=knowledge_base,
         ontology_file="planning_ontology.ttl",
         model_name="gpt-oss:20b"
     )
 
     analysis_spec = qp.process_query(selected_query, "outputs/analysis_spec.json")
+    qp.close()
 
     print(f"\n✓ Analysis specification generated")
 
@@ -156,7 +155,10 @@ def interactive_query_demo():
     # Check prerequisites
     knowledge_base_file = "outputs/knowledge_base.json"
 
-    if not Path(knowledge_base_file).exists():
+    # Parse the knowledge base once; the agent keeps it for every query
+    try:
+        knowledge_base = orjson.loads(Path(knowledge_base_file).read_bytes())
+    except FileNotFoundError:
         print("\nError: Knowledge base not found!")
         print("Please run demo_full_workflow() first to generate the knowledge base.")
         return
@@ -164,7 +166,7 @@ def interactive_query_demo():
     # Initialize QP
     print("\nInitializing Query Processing Agent...")
     qp = QueryProcessingAgent(
-        knowledge_base_file=knowledge_base_file,
+        knowledge_base=knowledge_base,
         ontology_file="planning_ontology.ttl",
         model_name="gpt-oss:20b"
     )
@@ -201,6 +203,7 @@ def interactive_query_demo():
         except Exception as e:
             print(f"Error: {str(e)}\n")
 
+    qp.close()
     print(f"\nProcessed {query_count} queries. Goodbye!")
 
 
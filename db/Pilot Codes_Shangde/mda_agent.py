@@ -3,117 +3,381 @@ Metadata Discovery Agent (MDA)
 Autonomously explores data directory and builds comprehensive knowledge base
 """
 
-import json
-import ollama
+import asyncio
+import hashlib
+import string
+from collections import OrderedDict
+import orjson
+from ollama import AsyncClient
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 from datetime import datetime
+from agent_common import REASONING_HEADROOM, load_cached_json, save_cached_json, think_setting
+
+
+# Invariant instructions are sent as a byte-identical system message so Ollama
+# can reuse the cached prompt prefix across datasets
+SYS_ANALYZE = """You analyze datasets for an urban planning knowledge base.
+
+For the dataset described by the user, answer each section:
+CLASSIFICATION: "primary" (original/raw data collected from sources, e.g., census, surveys, satellite imagery) or "secondary" (derived/processed from other datasets, e.g., aggregated, dissolved, clipped, calculated)
+SPATIAL_EXTENT: Geographic area covered by the extent in 5 words or less (e.g., "Miami-Dade County, Florida"), or "unknown"
+TEMPORAL_PERIOD: Year (e.g., "2024") or period (e.g., "2020-2023") the dataset likely represents, or "unknown"
+SEMANTIC: What this dataset represents (one sentence) and its urban planning domain (e.g., "land use", "transportation", "demographics")
+FIELDS: For each listed field, a brief meaning and a category (categorical/numerical/temporal/spatial)
+TASKS: 3-5 specific planning analysis tasks it can support (e.g., "Transit accessibility analysis", "Zoning compliance checking")
+
+Respond with a single JSON object:
+{"classification": "primary|secondary", "extent_description": "...", "reference_period": "...", "represents": "...", "domain": "...", "fields": [{"name": "...", "meaning": "...", "category": "..."}], "tasks": ["..."]}"""
+
+# Substrings of a field name or type that mark it as temporal
+DATE_KEYS = frozenset({'date', 'year', 'time', 'timestamp', 'yr'})
+
+# Keep the model loaded between requests and use a context sized for one dataset:
+# about 800 prompt tokens at max_fields=10 plus the generation budget below
+KEEP_ALIVE = '30m'
+NUM_CTX = 3072
+
+# Generation budget for the JSON reply, from the replies in outputs/knowledge_base.json:
+# everything but the fields took at most ~210 tokens and each field entry at most ~64
+NUM_PREDICT_BASE = 256
+NUM_PREDICT_PER_FIELD = 64
+
+CLASSIFICATIONS = frozenset({'primary', 'secondary'})
+
+# Identical prompts within a run (e.g. tiles sharing name and schema) share one request
+CHAT_MEMO_SIZE = 4096
+
+# orjson options for knowledge base records (KB file and cache entries)
+JSON_OPTS = orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC
+
+# Attribute columns of the admin-1 boundaries file (Natural Earth naming)
+REGION_NAME_FIELD = 'name'
+REGION_COUNTRY_FIELD = 'admin'
+
+# Skeleton of the per-dataset user message; only the dataset-specific slots vary
+MDA_TEMPLATE = """Filename: $filename
+Data type: $data_type
+File size: $file_size
+Modified: $modified
+Geometry: $geometry$extent
+
+Fields:
+$fields_block"""
 
 
 class MetadataDiscoveryAgent:
     """Main MDA class that orchestrates data understanding"""
 
-    def __init__(self, model_name: str = "gpt-oss:20b", max_fields: int = 10):
+    def __init__(self, model_name: str = "gpt-oss:20b", max_fields: int = 10, concurrency: int = 4,
+                 regions_file: Optional[str] = None):
         """
         Initialize MDA with Ollama model
 
         Args:
             model_name: Name of Ollama model to use
             max_fields: Maximum number of fields to analyze per dataset
+            concurrency: Maximum number of in-flight LLM requests (match OLLAMA_NUM_PARALLEL)
+            regions_file: Optional admin-1 boundaries (e.g. Natural Earth
+                ne_10m_admin_1_states_provinces) used to name dataset extents locally
         """
         self.model_name = model_name
         self.max_fields = max_fields
+        self.concurrency = concurrency
+        self.regions_file = regions_file
+        self._regions, self._region_tree = self._load_region_index(regions_file)
         self.metadata_cache = None
-
-    def discover(self, metadata_file: str, output_file: str = "outputs/knowledge_base.json") -> Dict[str, Any]:
+        self.client = None
+        self._semaphore = None
+        self._chat_memo = OrderedDict()
+        self._prompt_tmpl = string.Template(MDA_TEMPLATE)
+        self._think = think_setting(model_name)
+
+    def discover(self, metadata_file: str, output_file: str = "outputs/knowledge_base.json",
+                 force: bool = False) -> Dict[str, Any]:
         """
         Main discovery process
 
         Args:
             metadata_file: Path to metadata_output.json from scanner
             output_file: Path to save knowledge base
+            force: If True, re-analyze datasets even if a cached analysis exists
 
         Returns:
             Complete knowledge base dictionary
         """
+        return asyncio.run(self.discover_async(metadata_file, output_file, force))
+
+    async def discover_async(self, metadata_file: str,
+                             output_file: str = "outputs/knowledge_base.json",
+                             force: bool = False) -> Dict[str, Any]:
+        """Async variant of discover(); analyzes all datasets concurrently"""
+        # Client and semaphore are bound to the running event loop
+        self.client = AsyncClient()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._chat_memo = OrderedDict()
+
+        try:
+            return await self._discover(metadata_file, output_file, force)
+        finally:
+            # Release the connection pool before the event loop is torn down
+            await self.client.close()
+            self.client = None
+
+    async def _discover(self, metadata_file: str, output_file: str, force: bool) -> Dict[str, Any]:
+        """Analyze all datasets with the client of the running discovery"""
         print(f"[MDA] Loading metadata from: {metadata_file}")
-        with open(metadata_file, 'r', encoding='utf-8') as f:
-            self.metadata_cache = json.load(f)
+        self.metadata_cache = orjson.loads(Path(metadata_file).read_bytes())
 
-        print(f"[MDA] Analyzing {len(self.metadata_cache['files'])} datasets...")
+        total = len(self.metadata_cache['files'])
+        print(f"[MDA] Analyzing {total} datasets...")
 
+        # total_datasets counts the analyzed datasets; failed ones are listed separately
         knowledge_base = {
             "discovery_timestamp": datetime.now().isoformat(),
             "source_metadata": metadata_file,
-            "total_datasets": len(self.metadata_cache['files']),
-            "datasets": []
+            "total_datasets": 0,
+            "datasets": [],
+            "failed_datasets": []
         }
 
-        for idx, file_meta in enumerate(self.metadata_cache['files'], 1):
-            print(f"[MDA] Processing {idx}/{knowledge_base['total_datasets']}: {file_meta['file_name']}")
+        # Reuse earlier analyses of unchanged datasets, keyed by metadata content. Each
+        # analysis is cached as soon as it completes, so an interrupted run resumes here
+        cache_dir = Path(output_file).parent / '.mda_cache'
+        results = [None] * total
+        pending = []
+
+        for idx, file_meta in enumerate(self.metadata_cache['files']):
+            cache_file = cache_dir / f"{self._cache_key(file_meta)}.json"
+            cached = None if force else load_cached_json(cache_file)
+            if cached is not None:
+                results[idx] = cached
+            else:
+                pending.append((idx, file_meta, cache_file))
 
-            dataset_knowledge = self._analyze_dataset(file_meta)
-            knowledge_base['datasets'].append(dataset_knowledge)
+        if len(pending) < len(results):
+            print(f"[MDA] Reusing {len(results) - len(pending)} cached dataset analyses")
+
+        if pending:
+            await self._warmup()
+
+            tasks = [
+                self._analyze_dataset(file_meta, idx + 1, total, cache_file)
+                for idx, file_meta, cache_file in pending
+            ]
+            analyzed = await asyncio.gather(*tasks, return_exceptions=True)
+
+            for (idx, file_meta, _), result in zip(pending, analyzed):
+                if isinstance(result, Exception):
+                    print(f"  Warning: Analysis of {file_meta['file_name']} failed - {str(result)}")
+                    knowledge_base['failed_datasets'].append({
+                        'file_name': file_meta['file_name'],
+                        'file_path': file_meta['file_path'],
+                        'error': str(result)
+                    })
+                    continue
+                results[idx] = result
+
+        knowledge_base['datasets'] = [result for result in results if result is not None]
+        knowledge_base['total_datasets'] = len(knowledge_base['datasets'])
 
         # Save knowledge base
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(knowledge_base, f, indent=2, ensure_ascii=False)
+        Path(output_file).write_bytes(
+            orjson.dumps(knowledge_base, option=JSON_OPTS | orjson.OPT_INDENT_2)
+        )
 
         print(f"\n[MDA] Knowledge base saved to: {output_file}")
         return knowledge_base
 
-    def _analyze_dataset(self, file_meta: Dict[str, Any]) -> Dict[str, Any]:
+    def _cache_key(self, file_meta: Dict[str, Any]) -> str:
+        """Content hash of everything a dataset analysis depends on"""
+        payload = orjson.dumps(
+            {'model': self.model_name, 'max_fields': self.max_fields,
+             'regions_file': self.regions_file, 'file_meta': file_meta},
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str
+        )
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    @staticmethod
+    def _load_region_index(regions_file: Optional[str]):
+        """Load admin-1 polygons once and index them for bounding box lookups"""
+        if not regions_file:
+            return None, None
+
+        try:
+            import geopandas as gpd
+            from shapely.strtree import STRtree
+
+            regions = gpd.read_file(regions_file).to_crs("EPSG:4326")
+            names = [
+                f"{name}, {country}" if country else str(name)
+                for name, country in zip(regions[REGION_NAME_FIELD], regions[REGION_COUNTRY_FIELD])
+            ]
+            geometries = list(regions.geometry)
+            print(f"[MDA] Loaded {len(names)} regions from: {regions_file}")
+            return (names, geometries), STRtree(geometries)
+        except ImportError:
+            print("  Warning: geopandas/shapely not installed, extents will be described by the LLM")
+        except Exception as e:
+            print(f"  Warning: Could not load regions - {str(e)}")
+        return None, None
+
+    def _lookup_region(self, bounds_latlon: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Name the admin-1 region overlapping most of a lat/lon bounding box, or None"""
+        if self._region_tree is None or not bounds_latlon or 'west' not in bounds_latlon:
+            return None
+
+        from shapely.geometry import box
+
+        bbox = box(bounds_latlon['west'], bounds_latlon['south'],
+                   bounds_latlon['east'], bounds_latlon['north'])
+        hits = self._region_tree.query(bbox, predicate='intersects')
+        if len(hits) == 0:
+            return None
+
+        names, geometries = self._regions
+        best = max(hits, key=lambda i: geometries[i].intersection(bbox).area)
+        return names[best]
+
+    async def _warmup(self):
+        """Load the model before dispatching prompts so the first batch doesn't pay load time"""
+        try:
+            await self.client.chat(model=self.model_name, messages=[], keep_alive=KEEP_ALIVE)
+        except Exception as e:
+            print(f"  Warning: Model warmup failed - {str(e)}")
+
+    async def _chat(self, system: str, prompt: str, num_predict: int, **kwargs) -> str:
+        """Send a system + user prompt to the model, sharing the request with identical prompts"""
+        key = (self.model_name, system, prompt, num_predict, tuple(sorted(kwargs.items())))
+
+        # Concurrent callers await the same in-flight task, so a cold miss is sent only once
+        task = self._chat_memo.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._chat_uncached(system, prompt, num_predict, **kwargs))
+            task.add_done_callback(lambda t: self._forget_failed_chat(key, t))
+            self._chat_memo[key] = task
+            if len(self._chat_memo) > CHAT_MEMO_SIZE:
+                self._chat_memo.popitem(last=False)
+        else:
+            self._chat_memo.move_to_end(key)
+
+        return await task
+
+    def _forget_failed_chat(self, key: tuple, task: asyncio.Future):
+        """Drop failed requests from the memo so later callers retry"""
+        if (task.cancelled() or task.exception() is not None) and self._chat_memo.get(key) is task:
+            del self._chat_memo[key]
+
+    async def _chat_uncached(self, system: str, prompt: str, num_predict: int, **kwargs) -> str:
+        """Send a system + user prompt to the model, bounded by the concurrency limit"""
+        async with self._semaphore:
+            response = await self.client.chat(
+                model=self.model_name,
+                messages=[
+                    {'role': 'system', 'content': system},
+                    {'role': 'user', 'content': prompt}
+                ],
+                keep_alive=KEEP_ALIVE,
+                think=self._think,
+                options={'num_ctx': NUM_CTX, 'temperature': 0,
+                         'num_predict': num_predict + (REASONING_HEADROOM if self._think else 0)},
+                **kwargs
+            )
+        return response['message']['content']
+
+    async def _analyze_dataset(self, file_meta: Dict[str, Any], idx: int, total: int,
+                               cache_file: Optional[Path] = None) -> Dict[str, Any]:
         """Comprehensive analysis of a single dataset"""
 
+        print(f"[MDA] Processing {idx}/{total}: {file_meta['file_name']}")
+
+        # Extents inside a known region are named locally instead of by the LLM
+        region = None
+        if file_meta['data_type'] == 'geospatial':
+            region = self._lookup_region(file_meta.get('bounds_latlon'))
+
+        analysis = await self._analyze_dataset_single_prompt(file_meta, region)
+
         dataset_knowledge = {
             "file_name": file_meta['file_name'],
             "file_path": file_meta['file_path'],
             "data_type": file_meta['data_type'],
-            "classification": self._classify_primary_secondary(file_meta),
-            "spatial_context": self._extract_spatial_context(file_meta),
-            "temporal_context": self._extract_temporal_context(file_meta),
-            "semantic_context": self._extract_semantic_context(file_meta),
-            "fields": self._analyze_fields(file_meta),
-            "capable_tasks": self._identify_capable_tasks(file_meta)
+            "classification": self._classify_primary_secondary(analysis),
+            "spatial_context": self._extract_spatial_context(file_meta, analysis, region),
+            "temporal_context": self._extract_temporal_context(file_meta, analysis),
+            "semantic_context": self._extract_semantic_context(analysis),
+            "fields": self._analyze_fields(file_meta, analysis),
+            "capable_tasks": self._identify_capable_tasks(file_meta, analysis)
         }
 
-        return dataset_knowledge
+        # Only cache real LLM answers, so fallbacks from a failed call are retried
+        if analysis and cache_file is not None:
+            save_cached_json(cache_file, dataset_knowledge, JSON_OPTS)
 
-    def _classify_primary_secondary(self, file_meta: Dict[str, Any]) -> str:
-        """Classify dataset as primary or secondary using LLM"""
+        return dataset_knowledge
 
-        prompt = f"""Classify this dataset as either "primary" or "secondary":
+    async def _analyze_dataset_single_prompt(self, file_meta: Dict[str, Any],
+                                             region: Optional[str] = None) -> Dict[str, Any]:
+        """Interpret a dataset with one JSON-constrained LLM call covering all sections
 
-Primary data = Original/raw data collected from sources (e.g., census, surveys, satellite imagery)
-Secondary data = Derived/processed data generated from other datasets (e.g., aggregated, dissolved, clipped, calculated)
+        Args:
+            file_meta: Scanner metadata for the dataset
+            region: Locally resolved region name, sent in place of the raw extent
+        """
 
-Dataset name: {file_meta['file_name']}
-Data type: {file_meta.get('data_type', 'unknown')}
-File size: {file_meta.get('file_size', {}).get('readable', 'unknown')}
+        # Only the short dataset-specific part varies between calls
+        extent = ''
+        if region:
+            extent = f"\nRegion: {region}"
+        elif 'bounds_latlon' in file_meta:
+            bounds = file_meta['bounds_latlon']
+            extent = (
+                f"\nExtent: West: {bounds.get('west')}, South: {bounds.get('south')}, "
+                f"East: {bounds.get('east')}, North: {bounds.get('north')}"
+            )
 
-Analyze the filename and context. Respond with ONLY one word: "primary" or "secondary"."""
+        # Fields with a few sample values (limit based on max_fields setting)
+        sample_data = file_meta.get('sample_data', {})
+        fields_info = [
+            f"{idx}. {field['name']} | Type: {field.get('type', 'unknown')} | "
+            f"Samples: {str(sample_data[field['name']][:3]) if sample_data.get(field['name']) else 'No samples'}"
+            for idx, field in enumerate(file_meta.get('features', [])[:self.max_fields], 1)
+        ]
+
+        prompt = self._prompt_tmpl.substitute(
+            filename=file_meta['file_name'],
+            data_type=file_meta.get('data_type', 'unknown'),
+            file_size=file_meta.get('file_size', {}).get('readable', 'unknown'),
+            modified=file_meta.get('last_modified', 'unknown'),
+            geometry=file_meta.get('geometry_type', 'N/A'),
+            extent=extent,
+            fields_block='\n'.join(fields_info) if fields_info else "None"
+        )
 
         try:
-            response = ollama.chat(
-                model=self.model_name,
-                messages=[{'role': 'user', 'content': prompt}]
-            )
+            num_predict = NUM_PREDICT_BASE + NUM_PREDICT_PER_FIELD * len(fields_info)
+            content = await self._chat(SYS_ANALYZE, prompt, num_predict, format='json')
+            analysis = orjson.loads(content)
 
-            classification = response['message']['content'].strip().lower()
+            if not isinstance(analysis, dict):
+                raise ValueError("Response is not a JSON object")
 
-            # Validate response
-            if 'primary' in classification:
-                return 'primary'
-            elif 'secondary' in classification:
-                return 'secondary'
-            else:
-                return 'unknown'
+            return analysis
 
         except Exception as e:
-            print(f"  Warning: Classification failed - {str(e)}")
-            return 'unknown'
+            print(f"  Warning: Dataset analysis failed - {str(e)}")
+            return {}
+
+    def _classify_primary_secondary(self, analysis: Dict[str, Any]) -> str:
+        """Read primary/secondary classification from the LLM analysis"""
 
-    def _extract_spatial_context(self, file_meta: Dict[str, Any]) -> Dict[str, Any]:
+        classification = str(analysis.get('classification', '')).strip().lower()
+
+        # Validate response
+        return classification if classification in CLASSIFICATIONS else 'unknown'
+
+    def _extract_spatial_context(self, file_meta: Dict[str, Any], analysis: Dict[str, Any],
+                                 region: Optional[str] = None) -> Dict[str, Any]:
         """Extract and interpret spatial context"""
 
         spatial_context = {}
@@ -125,29 +389,16 @@ Analyze the filename and context. Respond with ONLY one word: "primary" or "seco
 
             # Geographic extent interpretation
             if 'bounds_latlon' in file_meta:
-                bounds = file_meta['bounds_latlon']
-                spatial_context['extent_coords'] = bounds
-
-                # Use LLM to interpret geographic location
-                prompt = f"""What geographic area/region is represented by these coordinates?
-West: {bounds.get('west')}, South: {bounds.get('south')}, East: {bounds.get('east')}, North: {bounds.get('north')}
-
-Provide a concise location description (e.g., "Miami-Dade County, Florida" or "Southern California Coast"). Response in 5 words or less."""
-
-                try:
-                    response = ollama.chat(
-                        model=self.model_name,
-                        messages=[{'role': 'user', 'content': prompt}]
-                    )
-                    spatial_context['extent_description'] = response['message']['content'].strip()
-                except:
-                    spatial_context['extent_description'] = 'Unknown region'
+                spatial_context['extent_coords'] = file_meta['bounds_latlon']
+                spatial_context['extent_description'] = (
+                    region or str(analysis.get('extent_description') or '').strip() or 'Unknown region'
+                )
 
             spatial_context['feature_count'] = file_meta.get('feature_count', 0)
 
         return spatial_context
 
-    def _extract_temporal_context(self, file_meta: Dict[str, Any]) -> Dict[str, Any]:
+    def _extract_temporal_context(self, file_meta: Dict[str, Any], analysis: Dict[str, Any]) -> Dict[str, Any]:
         """Extract and interpret temporal context"""
 
         temporal_context = {}
@@ -157,10 +408,12 @@ Provide a concise location description (e.g., "Miami-Dade County, Florida" or "S
 
         # Check for temporal fields
         if 'features' in file_meta:
-            date_fields = [
-                f['name'] for f in file_meta['features']
-                if 'date' in f.get('type', '').lower() or 'date' in f.get('name', '').lower()
-            ]
+            date_fields = []
+            for f in file_meta['features']:
+                # Lowercase name and type once, then test every key against both
+                name_type = f"{f.get('name', '')}|{f.get('type', '') or ''}".lower()
+                if any(key in name_type for key in DATE_KEYS):
+                    date_fields.append(f['name'])
 
             if date_fields:
                 temporal_context['temporal_fields'] = date_fields
@@ -169,181 +422,27 @@ Provide a concise location description (e.g., "Miami-Dade County, Florida" or "S
                 temporal_context['has_temporal_dimension'] = False
 
         # LLM inference of reference year/period
-        prompt = f"""Based on the filename and context, what year or time period does this dataset likely represent?
-
-Filename: {file_meta['file_name']}
-Modified: {temporal_context['file_modified']}
-
-Respond with just the year (e.g., "2024") or period (e.g., "2020-2023"). If uncertain, say "unknown"."""
-
-        try:
-            response = ollama.chat(
-                model=self.model_name,
-                messages=[{'role': 'user', 'content': prompt}]
-            )
-            temporal_context['reference_period'] = response['message']['content'].strip()
-        except:
-            temporal_context['reference_period'] = 'unknown'
+        temporal_context['reference_period'] = str(analysis.get('reference_period') or '').strip() or 'unknown'
 
         return temporal_context
 
-    def _extract_semantic_context(self, file_meta: Dict[str, Any]) -> Dict[str, Any]:
-        """Extract semantic meaning using LLM"""
+    def _extract_semantic_context(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Read semantic meaning from the LLM analysis"""
 
-        # Prepare context for LLM
-        context_info = {
-            'filename': file_meta['file_name'],
-            'data_type': file_meta.get('data_type', 'unknown'),
-            'geometry': file_meta.get('geometry_type', 'N/A'),
-            'sample_fields': []
+        return {
+            'represents': str(analysis.get('represents') or '').strip() or 'Unknown',
+            'domain': str(analysis.get('domain') or '').strip() or 'Unknown'
         }
 
-        # Get sample field names
-        if 'features' in file_meta:
-            context_info['sample_fields'] = [f['name'] for f in file_meta['features'][:5]]
-
-        # Get sample data if available
-        sample_data_preview = ""
-        if 'sample_data' in file_meta and file_meta['sample_data']:
-            sample_items = list(file_meta['sample_data'].items())[:3]
-            sample_data_preview = "\n".join([f"{k}: {v}" for k, v in sample_items])
-
-        prompt = f"""Analyze this dataset and describe what it represents in urban planning context.
-
-Filename: {context_info['filename']}
-Type: {context_info['data_type']}
-Geometry: {context_info['geometry']}
-Fields: {', '.join(context_info['sample_fields'])}
-
-Sample data:
-{sample_data_preview}
-
-Provide:
-1. What this dataset represents (one sentence)
-2. Urban planning domain (e.g., "land use", "transportation", "demographics")
-
-Format your response as:
-REPRESENTS: <one sentence>
-DOMAIN: <domain name>"""
-
-        try:
-            response = ollama.chat(
-                model=self.model_name,
-                messages=[{'role': 'user', 'content': prompt}]
-            )
-
-            content = response['message']['content']
-
-            # Parse response
-            represents = "Unknown"
-            domain = "Unknown"
-
-            for line in content.split('\n'):
-                if 'REPRESENTS:' in line:
-                    represents = line.split('REPRESENTS:')[1].strip()
-                elif 'DOMAIN:' in line:
-                    domain = line.split('DOMAIN:')[1].strip()
-
-            return {
-                'represents': represents,
-                'domain': domain
-            }
-
-        except Exception as e:
-            print(f"  Warning: Semantic extraction failed - {str(e)}")
-            return {
-                'represents': 'Unknown',
-                'domain': 'Unknown'
-            }
-
-    def _analyze_fields(self, file_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Analyze field meanings using LLM (batch mode for speed)"""
+    def _analyze_fields(self, file_meta: Dict[str, Any], analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Read field meanings from the LLM analysis"""
 
         if 'features' not in file_meta or not file_meta['features']:
             return []
 
-        # Get sample data for context
-        sample_data = file_meta.get('sample_data', {})
-
-        # Prepare all fields info (limit based on max_fields setting)
         fields_to_analyze = file_meta['features'][:self.max_fields]
 
-        # Build batch prompt with all fields
-        fields_info = []
-        for idx, field in enumerate(fields_to_analyze, 1):
-            field_name = field['name']
-            field_type = field.get('type', 'unknown')
-            sample_values = sample_data.get(field_name, [])
-            sample_str = str(sample_values[:3]) if sample_values else "No samples"
-
-            fields_info.append(f"{idx}. {field_name} | Type: {field_type} | Samples: {sample_str}")
-
-        prompt = f"""Analyze these data fields and provide interpretation for each.
-
-Fields:
-{chr(10).join(fields_info)}
-
-For EACH field, respond in this format:
-FIELD: <field_name>
-MEANING: <brief description>
-CATEGORY: <categorical/numerical/temporal/spatial>
----"""
-
-        try:
-            response = ollama.chat(
-                model=self.model_name,
-                messages=[{'role': 'user', 'content': prompt}]
-            )
-
-            content = response['message']['content']
-
-            # Parse batch response
-            analyzed_fields = []
-            current_field = {}
-
-            for line in content.split('\n'):
-                line = line.strip()
-
-                if line.startswith('FIELD:'):
-                    # Save previous field if exists
-                    if current_field:
-                        analyzed_fields.append(current_field)
-                    # Start new field
-                    field_name = line.split('FIELD:')[1].strip()
-                    current_field = {
-                        'name': field_name,
-                        'type': next((f.get('type', 'unknown') for f in fields_to_analyze if f['name'] == field_name), 'unknown'),
-                        'meaning': 'Unknown',
-                        'category': 'unknown'
-                    }
-                elif line.startswith('MEANING:') and current_field:
-                    current_field['meaning'] = line.split('MEANING:')[1].strip()
-                elif line.startswith('CATEGORY:') and current_field:
-                    current_field['category'] = line.split('CATEGORY:')[1].strip().lower()
-                elif line == '---' and current_field:
-                    # End of current field
-                    analyzed_fields.append(current_field)
-                    current_field = {}
-
-            # Add last field if not yet added
-            if current_field:
-                analyzed_fields.append(current_field)
-
-            # Ensure we have results for all fields (fallback)
-            if len(analyzed_fields) < len(fields_to_analyze):
-                for field in fields_to_analyze:
-                    if not any(af['name'] == field['name'] for af in analyzed_fields):
-                        analyzed_fields.append({
-                            'name': field['name'],
-                            'type': field.get('type', 'unknown'),
-                            'meaning': 'Parse failed',
-                            'category': 'unknown'
-                        })
-
-            return analyzed_fields
-
-        except Exception as e:
-            print(f"  Warning: Batch field analysis failed - {str(e)}")
+        if not isinstance(analysis.get('fields'), list):
             # Fallback: return basic info
             return [{
                 'name': field['name'],
@@ -352,52 +451,49 @@ CATEGORY: <categorical/numerical/temporal/spatial>
                 'category': 'unknown'
             } for field in fields_to_analyze]
 
-    def _identify_capable_tasks(self, file_meta: Dict[str, Any]) -> List[str]:
+        # Field types by name, so matching LLM entries back to the schema is O(1)
+        field_types = {field['name']: field.get('type', 'unknown') for field in fields_to_analyze}
+
+        analyzed_fields = []
+        for item in analysis['fields']:
+            if not isinstance(item, dict) or not item.get('name'):
+                continue
+            field_name = str(item['name']).strip()
+            analyzed_fields.append({
+                'name': field_name,
+                'type': field_types.get(field_name, 'unknown'),
+                'meaning': str(item.get('meaning') or 'Unknown').strip(),
+                'category': str(item.get('category') or 'unknown').strip().lower()
+            })
+
+        # Ensure we have results for all fields (fallback)
+        if len(analyzed_fields) < len(fields_to_analyze):
+            answered = {af['name'] for af in analyzed_fields}
+            for field in fields_to_analyze:
+                if field['name'] not in answered:
+                    analyzed_fields.append({
+                        'name': field['name'],
+                        'type': field_types[field['name']],
+                        'meaning': 'Parse failed',
+                        'category': 'unknown'
+                    })
+
+        return analyzed_fields
+
+    def _identify_capable_tasks(self, file_meta: Dict[str, Any], analysis: Dict[str, Any]) -> List[str]:
         """Identify what analysis tasks this dataset can support"""
 
         # Start with operations from metadata scanner
         base_operations = file_meta.get('applicable_operations', [])
 
-        # Use LLM to identify higher-level planning tasks
-        context = {
-            'filename': file_meta['file_name'],
-            'type': file_meta.get('data_type'),
-            'geometry': file_meta.get('geometry_type', 'N/A')
-        }
-
-        prompt = f"""Based on this dataset characteristics, what urban planning analysis tasks can it support?
-
-Filename: {context['filename']}
-Type: {context['type']}
-Geometry: {context['geometry']}
-
-List 3-5 specific planning analysis tasks (e.g., "Transit accessibility analysis", "Zoning compliance checking").
-
-Format: One task per line, no numbering."""
-
-        try:
-            response = ollama.chat(
-                model=self.model_name,
-                messages=[{'role': 'user', 'content': prompt}]
-            )
-
-            content = response['message']['content'].strip()
-
-            # Parse tasks (each line is a task)
-            llm_tasks = [
-                line.strip().lstrip('•-*').strip()
-                for line in content.split('\n')
-                if line.strip() and not line.strip().startswith('#')
-            ]
-
-            # Combine base operations with LLM-identified tasks
-            all_tasks = base_operations[:5] + llm_tasks  # Limit base ops to 5
+        llm_tasks = analysis.get('tasks')
+        if not isinstance(llm_tasks, list):
+            return base_operations[:10]  # Fallback to base operations
 
-            return all_tasks
+        llm_tasks = [str(task).strip() for task in llm_tasks if str(task).strip()]
 
-        except Exception as e:
-            print(f"  Warning: Task identification failed - {str(e)}")
-            return base_operations[:10]  # Fallback to base operations
+        # Combine base operations with LLM-identified tasks
+        return base_operations[:5] + llm_tasks  # Limit base ops to 5
 
 
 def main():
@@ -412,6 +508,13 @@ def main():
                        default='gpt-oss:20b')
     parser.add_argument('-f', '--max-fields', type=int, help='Max fields to analyze per dataset',
                        default=10)
+    parser.add_argument('--force', action='store_true',
+                       help='Re-analyze all datasets, ignoring cached analyses')
+    parser.add_argument('-c', '--concurrency', type=int,
+                       help='Max concurrent LLM requests (match OLLAMA_NUM_PARALLEL)',
+                       default=4)
+    parser.add_argument('-r', '--regions',
+                       help='Admin-1 boundaries file for naming dataset extents without the LLM')
 
     args = parser.parse_args()
 
@@ -419,11 +522,13 @@ def main():
     print("Metadata Discovery Agent (MDA)")
     print("=" * 60)
 
-    mda = MetadataDiscoveryAgent(model_name=args.model, max_fields=args.max_fields)
-    knowledge_base = mda.discover(args.metadata_file, args.output)
+    mda = MetadataDiscoveryAgent(model_name=args.model, max_fields=args.max_fields,
+                                 concurrency=args.concurrency, regions_file=args.regions)
+    knowledge_base = mda.discover(args.metadata_file, args.output, force=args.force)
 
     print("\n" + "=" * 60)
-    print(f"Discovery complete! Analyzed {knowledge_base['total_datasets']} datasets")
+    print(f"Discovery complete! Analyzed {knowledge_base['total_datasets']} datasets, "
+          f"{len(knowledge_base['failed_datasets'])} failed")
     print("=" * 60)
 
 
@@ -4,52 +4,242 @@ Scans directories for data files and extracts standardized metadata without load
 """
 
 import os
-import json
+import itertools
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Iterator, Optional
 from datetime import datetime
 import mimetypes
+import orjson
+
+
+# Below this many files, process pool startup costs more than it saves
+PARALLEL_SCAN_THRESHOLD = 32
+
+# GeoJSON has no feature index, so only count features in files up to this size
+GEOJSON_COUNT_MAX_BYTES = 10 * 1024 * 1024
+
+# Vector sampling reads only the first few features and keeps their distinct values per field
+VECTOR_SAMPLE_FEATURES = 5
+
+# PDFium is not thread-safe, so thread-pool scans take turns calling it
+_PDFIUM_LOCK = threading.Lock()
+
+# OGR field types in fiona's schema spelling, so vector operations see the same type names
+OGR_FIELD_TYPES = {
+    'OFTInteger': 'int',
+    'OFTInteger64': 'int',
+    'OFTReal': 'float',
+    'OFTString': 'str',
+    'OFTDate': 'date',
+    'OFTTime': 'time',
+    'OFTDateTime': 'datetime',
+    'OFTBinary': 'bytes',
+    'OFTIntegerList': 'List[int]',
+    'OFTInteger64List': 'List[int]',
+    'OFTRealList': 'List[float]',
+    'OFTStringList': 'List[str]',
+}
+
+# Metadata output options; numpy scalars and non-string column names come from pandas
+JSON_OPTS = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _json_default(obj):
+    """Serialize tuple subclasses (e.g. rasterio BoundingBox) as lists, like json.dump"""
+    if isinstance(obj, tuple):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+# Module loaders for the analyzer libraries. Each analyzer's LIBRARIES maps a file
+# extension to the loaders its analysis calls, so pool workers warm only those
+@lru_cache(maxsize=None)
+def _fiona():
+    """fiona module, imported on first use"""
+    import fiona
+    return fiona
+
+
+@lru_cache(maxsize=None)
+def _pyogrio():
+    """pyogrio module, imported on first use"""
+    import pyogrio
+    import pyogrio.raw
+    return pyogrio
+
+
+def _vector_library():
+    """pyogrio, or fiona when pyogrio is not installed"""
+    try:
+        return _pyogrio()
+    except ImportError:
+        return _fiona()
+
+
+@lru_cache(maxsize=None)
+def _rasterio():
+    """rasterio module, imported on first use"""
+    import rasterio
+    import rasterio.enums
+    import rasterio.windows
+    return rasterio
+
+
+@lru_cache(maxsize=None)
+def _pandas():
+    """pandas module, imported on first use"""
+    import pandas
+    return pandas
+
+
+@lru_cache(maxsize=None)
+def _pypdf2():
+    """PyPDF2 module, imported on first use"""
+    import PyPDF2
+    return PyPDF2
+
+
+@lru_cache(maxsize=None)
+def _pypdfium2():
+    """pypdfium2 module, imported on first use"""
+    import pypdfium2
+    return pypdfium2
+
+
+def _pdf_library():
+    """pypdfium2, or PyPDF2 when pypdfium2 is not installed"""
+    try:
+        return _pypdfium2()
+    except ImportError:
+        return _pypdf2()
+
+
+@lru_cache(maxsize=None)
+def _docx():
+    """python-docx module, imported on first use"""
+    import docx
+    return docx
+
+
+def _warm_imports(loaders) -> None:
+    """Process pool initializer: import analyzer libraries once per worker, before any file"""
+    for loader in loaders:
+        try:
+            loader()
+        except ImportError:
+            # The analyzer reports the missing library per file
+            pass
+
+
+def _iter_files(root: str) -> Iterator[os.DirEntry]:
+    """Yield entries of all files under root, walking with an explicit os.scandir stack"""
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    # DirEntry type checks come from readdir, so no stat is needed here
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        yield entry
+        except OSError:
+            # Unreadable directory; skip it like rglob would
+            continue
+
+
+def _file_extension(name: str) -> str:
+    """Lowercase extension of a file name, matching Path.suffix without building a Path"""
+    dot = name.rfind('.')
+    return name[dot:].lower() if 0 < dot < len(name) - 1 else ''
+
+
+# Target CRS for lat/lon bounds
+WGS84 = "EPSG:4326"
+
+
+@lru_cache(maxsize=256)
+def _crs_wkt(crs_str: str) -> str:
+    """Canonical WKT for a CRS string, so different spellings of one CRS share a transformer"""
+    from pyproj import CRS
+    return CRS.from_user_input(crs_str).to_wkt()
+
+
+@lru_cache(maxsize=256)
+def _cached_transformer(src_crs_wkt: str, dst_crs_wkt: str):
+    """Transformer between two CRSs, built once per (source, target) pair"""
+    from pyproj import Transformer
+    return Transformer.from_crs(src_crs_wkt, dst_crs_wkt, always_xy=True)
+
+
+def _get_transformer(crs_str: str):
+    """Transformer from the given CRS to WGS84"""
+    return _cached_transformer(_crs_wkt(crs_str), _crs_wkt(WGS84))
+
+
+@lru_cache(maxsize=64)
+def _is_geographic(crs_str: str) -> bool:
+    """Whether the given CRS is already lat/lon"""
+    from pyproj import CRS
+    return CRS.from_user_input(crs_str).is_geographic
 
 
 class DataAnalyzer:
     """Base class for data analysis"""
 
+    SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+
     @staticmethod
-    def get_file_size(file_path: str) -> Dict[str, Any]:
-        """Get file size in bytes and human-readable format"""
-        size_bytes = os.path.getsize(file_path)
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if size_bytes < 1024.0:
-                return {'bytes': os.path.getsize(file_path), 'readable': f"{size_bytes:.2f} {unit}"}
-            size_bytes /= 1024.0
-        return {'bytes': os.path.getsize(file_path), 'readable': f"{size_bytes:.2f} PB"}
+    def get_file_size(file_path: str, size_bytes: Optional[int] = None) -> Dict[str, Any]:
+        """Get file size in bytes and human-readable format
+
+        Pass size_bytes when the size is already known (e.g. from a directory walk)
+        to skip the stat call.
+        """
+        if size_bytes is None:
+            size_bytes = os.stat(file_path).st_size
+
+        # Each unit step is 2**10, so the unit index follows from the bit length
+        unit_idx = min(max(0, (size_bytes.bit_length() - 1) // 10), len(DataAnalyzer.SIZE_UNITS) - 1)
+        readable = size_bytes / (1 << (10 * unit_idx))
+        return {'bytes': size_bytes, 'readable': f"{readable:.2f} {DataAnalyzer.SIZE_UNITS[unit_idx]}"}
 
 
 class GeospatialAnalyzer(DataAnalyzer):
     """Analyzer for geospatial data formats"""
 
-    SUPPORTED_FORMATS = ['.shp', '.geojson', '.json', '.tif', '.tiff', '.kml', '.kmz', '.gdb']
+    SUPPORTED_FORMATS = frozenset({'.shp', '.geojson', '.json', '.tif', '.tiff', '.kml', '.kmz', '.gdb'})
+
+    LIBRARIES = {
+        **dict.fromkeys(('.shp', '.geojson', '.json', '.kml'), (_vector_library,)),
+        **dict.fromkeys(('.tif', '.tiff'), (_rasterio,)),
+    }
 
     @staticmethod
-    def analyze(file_path: str) -> Dict[str, Any]:
+    def analyze(file_path: str, size: Optional[int] = None) -> Dict[str, Any]:
         """Analyze geospatial data without loading full dataset"""
+        ext = Path(file_path).suffix.lower()
+
         metadata = {
             'data_type': 'geospatial',
-            'file_size': DataAnalyzer.get_file_size(file_path),
-            'format': Path(file_path).suffix.lower(),
+            'file_size': DataAnalyzer.get_file_size(file_path, size),
+            'format': ext,
             'features': [],
             'sample_data': {},
             'applicable_operations': []
         }
 
-        ext = Path(file_path).suffix.lower()
-
         try:
             # Vector formats
-            if ext in ['.shp', '.geojson', '.json', '.kml']:
+            if ext in {'.shp', '.geojson', '.json', '.kml'}:
                 metadata.update(GeospatialAnalyzer._analyze_vector(file_path))
             # Raster formats
-            elif ext in ['.tif', '.tiff']:
+            elif ext in {'.tif', '.tiff'}:
                 metadata.update(GeospatialAnalyzer._analyze_raster(file_path))
             # Geodatabase
             elif ext == '.gdb':
@@ -62,79 +252,143 @@ class GeospatialAnalyzer(DataAnalyzer):
         return metadata
 
     @staticmethod
-    def _convert_bounds_to_latlon(bounds: tuple, source_crs) -> Dict[str, Any]:
+    def assign_bounds_latlon(files: List[Dict[str, Any]]) -> None:
         """
-        Convert bounding box from source CRS to WGS84 (lat/lon)
+        Convert bounding boxes of scanned files to WGS84 (lat/lon) in place
+
+        Files are grouped by CRS so each group needs a single vectorized transform
+        instead of one transform call per file.
 
         Args:
-            bounds: Tuple of (minx, miny, maxx, maxy) in source CRS
-            source_crs: Source coordinate reference system
+            files: File metadata dicts with 'bounds' (minx, miny, maxx, maxy) and 'crs'
+        """
+        groups = {}
+        for file_meta in files:
+            crs_str = file_meta.get('crs')
+            if file_meta.get('bounds') is not None and crs_str and crs_str != 'Unknown':
+                groups.setdefault(crs_str, []).append(file_meta)
+
+        for crs_str, group in groups.items():
+            bs = [file_meta['bounds'] for file_meta in group]
+            try:
+                # Check if already in lat/lon (EPSG:4326 or similar)
+                if _is_geographic(crs_str):
+                    wests = [b[0] for b in bs]
+                    souths = [b[1] for b in bs]
+                    easts = [b[2] for b in bs]
+                    norths = [b[3] for b in bs]
+                else:
+                    # Transform both corners of every box in one call
+                    n = len(bs)
+                    xs, ys = _get_transformer(crs_str).transform(
+                        [b[0] for b in bs] + [b[2] for b in bs],
+                        [b[1] for b in bs] + [b[3] for b in bs]
+                    )
+                    wests, easts = xs[:n], xs[n:]
+                    souths, norths = ys[:n], ys[n:]
+
+                for file_meta, west, south, east, north in zip(group, wests, souths, easts, norths):
+                    file_meta['bounds_latlon'] = {
+                        'west': west,
+                        'south': south,
+                        'east': east,
+                        'north': north,
+                        'formatted': f"West: {west:.6f}, South: {south:.6f}, East: {east:.6f}, North: {north:.6f}"
+                    }
+
+            except ImportError:
+                for file_meta in group:
+                    file_meta['bounds_latlon'] = {
+                        'error': 'pyproj not installed. Install with: pip install pyproj',
+                        'formatted': 'Conversion requires pyproj library'
+                    }
+            except Exception as e:
+                for file_meta in group:
+                    file_meta['bounds_latlon'] = {
+                        'error': f'Conversion failed: {str(e)}',
+                        'formatted': 'Unable to convert bounds'
+                    }
 
-        Returns:
-            Dictionary with lat/lon bounds and formatted string
+    @staticmethod
+    def _analyze_vector(file_path: str) -> Dict[str, Any]:
+        """Analyze vector data (Shapefile, GeoJSON, KML) using sampling
+
+        Layer metadata and the sample come from pyogrio in two bulk reads; fiona's
+        per-feature iteration is used only when pyogrio is not installed.
         """
         try:
-            from pyproj import Transformer, CRS
-
-            # Check if already in lat/lon (EPSG:4326 or similar)
-            source_crs_obj = CRS.from_user_input(source_crs)
-            if source_crs_obj.is_geographic:
-                # Already in lat/lon
-                return {
-                    'west': bounds[0],
-                    'south': bounds[1],
-                    'east': bounds[2],
-                    'north': bounds[3],
-                    'formatted': f"West: {bounds[0]:.6f}, South: {bounds[1]:.6f}, East: {bounds[2]:.6f}, North: {bounds[3]:.6f}"
-                }
-
-            # Transform to WGS84 (EPSG:4326)
-            transformer = Transformer.from_crs(source_crs, "EPSG:4326", always_xy=True)
+            pyogrio = _pyogrio()
+        except ImportError:
+            return GeospatialAnalyzer._analyze_vector_fiona(file_path)
 
-            # Transform corners
-            min_lon, min_lat = transformer.transform(bounds[0], bounds[1])
-            max_lon, max_lat = transformer.transform(bounds[2], bounds[3])
+        result = {}
 
-            return {
-                'west': min_lon,
-                'south': min_lat,
-                'east': max_lon,
-                'north': max_lat,
-                'formatted': f"West: {min_lon:.6f}, South: {min_lat:.6f}, East: {max_lon:.6f}, North: {max_lat:.6f}"
+        try:
+            # Forcing total bounds matches fiona, which always computes the layer extent
+            info = pyogrio.read_info(file_path, force_total_bounds=True)
+            result['crs'] = info['crs'] or 'Unknown'
+            result['geometry_type'] = info['geometry_type'] or 'None'
+            # -1 means the driver cannot count without scanning the layer
+            result['feature_count'] = info['features'] if info['features'] >= 0 else None
+            result['bounds'] = tuple(info['total_bounds']) if info['total_bounds'] is not None else None
+
+            # Get field names and types
+            names = info['fields'].tolist()
+            properties = {
+                name: 'bool' if subtype == 'OFSTBoolean' else OGR_FIELD_TYPES.get(ogr_type, str(dtype))
+                for name, dtype, ogr_type, subtype
+                in zip(names, info['dtypes'], info['ogr_types'], info['ogr_subtypes'])
             }
+            result['features'] = [
+                {'name': name, 'type': dtype}
+                for name, dtype in properties.items()
+            ]
+
+            # Determine applicable geoprocessing operations based on geometry type
+            # Do this BEFORE sampling so operations are always generated even if sampling fails
+            result['applicable_operations'] = GeospatialAnalyzer._get_vector_operations(
+                result['geometry_type'],
+                properties
+            )
+
+            # Sample first few features only, as one columnar read without geometries
+            try:
+                _, _, _, columns = pyogrio.raw.read(
+                    file_path,
+                    read_geometry=False,
+                    max_features=VECTOR_SAMPLE_FEATURES,
+                    datetime_as_string=True
+                )
+                # Skip None/NaN values; dedupe keeping first-seen order, so sample output is deterministic
+                result['sample_data'] = {
+                    name: list(dict.fromkeys(v for v in column.tolist() if v is not None and v == v))
+                    for name, column in zip(names, columns)
+                }
+            except Exception as sample_error:
+                # If sampling fails, just skip it and continue
+                result['sample_data'] = {}
+                result['sampling_warning'] = f"Could not sample data: {str(sample_error)}"
 
-        except ImportError:
-            return {
-                'error': 'pyproj not installed. Install with: pip install pyproj',
-                'formatted': 'Conversion requires pyproj library'
-            }
         except Exception as e:
-            return {
-                'error': f'Conversion failed: {str(e)}',
-                'formatted': 'Unable to convert bounds'
-            }
+            result['error'] = f"Vector analysis failed: {str(e)}"
+
+        return result
 
     @staticmethod
-    def _analyze_vector(file_path: str) -> Dict[str, Any]:
-        """Analyze vector data (Shapefile, GeoJSON, KML) using sampling"""
+    def _analyze_vector_fiona(file_path: str) -> Dict[str, Any]:
+        """Analyze vector data with fiona, iterating over the sampled features"""
         result = {}
 
         try:
-            import fiona
+            fiona = _fiona()
 
             with fiona.open(file_path, 'r') as src:
                 # Get schema without loading features
                 result['crs'] = src.crs.to_string() if src.crs else 'Unknown'
                 result['geometry_type'] = src.schema['geometry']
-                result['feature_count'] = len(src)
+                result['feature_count'] = GeospatialAnalyzer._count_vector_features(file_path, src)
                 result['bounds'] = src.bounds
 
-                # Convert bounds to lat/lon for easier interpretation
-                if src.crs:
-                    result['bounds_latlon'] = GeospatialAnalyzer._convert_bounds_to_latlon(
-                        src.bounds, src.crs
-                    )
-
                 # Get field names and types
                 properties = src.schema['properties']
                 result['features'] = [
@@ -153,32 +407,51 @@ class GeospatialAnalyzer(DataAnalyzer):
                 # Sample first few features only
                 # Wrapped in try-except so sampling errors don't break the entire analysis
                 try:
-                    sample_size = min(5, len(src))
-                    samples = {}
-                    for idx, feature in enumerate(src):
-                        if idx >= sample_size:
-                            break
+                    # Every feature carries the schema's properties, so allocate their lists up front
+                    samples = {prop_name: [] for prop_name in properties}
+                    for feature in itertools.islice(src, VECTOR_SAMPLE_FEATURES):
                         for prop_name, prop_value in feature['properties'].items():
-                            if prop_name not in samples:
-                                samples[prop_name] = []
                             # Skip None/null values to avoid errors
                             if prop_value is not None:
                                 samples[prop_name].append(prop_value)
 
-                    result['sample_data'] = {k: list(set(v)) for k, v in samples.items()}
+                    # Dedupe keeping first-seen order, so sample output is deterministic
+                    result['sample_data'] = {
+                        k: list(dict.fromkeys(v))
+                        for k, v in samples.items()
+                    }
                 except Exception as sample_error:
                     # If sampling fails, just skip it and continue
                     result['sample_data'] = {}
                     result['sampling_warning'] = f"Could not sample data: {str(sample_error)}"
 
         except ImportError:
-            result['error'] = 'Fiona not installed. Install with: pip install fiona'
-            result['applicable_operations'] = ['Install fiona/geopandas for analysis']
+            result['error'] = 'pyogrio or Fiona not installed. Install with: pip install pyogrio'
+            result['applicable_operations'] = ['Install pyogrio/fiona for analysis']
         except Exception as e:
             result['error'] = f"Vector analysis failed: {str(e)}"
 
         return result
 
+    @staticmethod
+    def _count_vector_features(file_path: str, src) -> Optional[int]:
+        """Count features from metadata where possible instead of scanning the layer"""
+        base, ext = os.path.splitext(file_path)
+
+        if ext.lower() == '.shp':
+            # The .shx index has a 100-byte header and one 8-byte record per feature
+            for shx_ext in ('.shx', '.SHX'):
+                try:
+                    return (os.stat(base + shx_ext).st_size - 100) // 8
+                except OSError:
+                    continue
+
+        if src.driver == 'GeoJSON' and os.stat(file_path).st_size > GEOJSON_COUNT_MAX_BYTES:
+            # Counting would parse the whole file
+            return None
+
+        return len(src)
+
     @staticmethod
     def _get_vector_operations(geometry_type: str, properties: Dict[str, str]) -> List[str]:
         """Determine applicable operations based on geometry type and attributes"""
@@ -241,7 +514,7 @@ class GeospatialAnalyzer(DataAnalyzer):
         result = {}
 
         try:
-            import rasterio
+            rasterio = _rasterio()
 
             with rasterio.open(file_path) as src:
                 result['crs'] = src.crs.to_string() if src.crs else 'Unknown'
@@ -252,15 +525,16 @@ class GeospatialAnalyzer(DataAnalyzer):
                 result['resolution'] = src.res
                 result['nodata_value'] = src.nodata
 
-                # Convert bounds to lat/lon for easier interpretation
-                if src.crs:
-                    result['bounds_latlon'] = GeospatialAnalyzer._convert_bounds_to_latlon(
-                        src.bounds, src.crs
+                if src.overviews(1):
+                    # Decimated read of the whole extent; GDAL serves it from the overviews
+                    sample = src.read(
+                        1, out_shape=(min(100, src.height), min(100, src.width)),
+                        resampling=rasterio.enums.Resampling.average
                     )
-
-                # Sample small window instead of full raster
-                window = rasterio.windows.Window(0, 0, min(100, src.width), min(100, src.height))
-                sample = src.read(1, window=window)
+                else:
+                    # Sample small window instead of full raster
+                    window = rasterio.windows.Window(0, 0, min(100, src.width), min(100, src.height))
+                    sample = src.read(1, window=window)
 
                 result['sample_data'] = {
                     'min': float(sample.min()),
@@ -331,35 +605,42 @@ class GeospatialAnalyzer(DataAnalyzer):
 class TabularAnalyzer(DataAnalyzer):
     """Analyzer for tabular data formats"""
 
-    SUPPORTED_FORMATS = ['.csv', '.xlsx', '.xls', '.parquet', '.tsv', '.txt']
+    SUPPORTED_FORMATS = frozenset({'.csv', '.xlsx', '.xls', '.parquet', '.tsv', '.txt'})
+
+    # Column dtypes summarized with min/max/mean; others (e.g. timedelta, uint8,
+    # nullable Int64) are listed without stats
+    NUMERIC_DTYPES = ('int64', 'float64', 'int32', 'float32')
+
+    LIBRARIES = dict.fromkeys(SUPPORTED_FORMATS, (_pandas,))
 
     @staticmethod
-    def analyze(file_path: str) -> Dict[str, Any]:
+    def analyze(file_path: str, size: Optional[int] = None) -> Dict[str, Any]:
         """Analyze tabular data using sampling"""
+        ext = Path(file_path).suffix.lower()
+
         metadata = {
             'data_type': 'tabular',
-            'file_size': DataAnalyzer.get_file_size(file_path),
-            'format': Path(file_path).suffix.lower(),
+            'file_size': DataAnalyzer.get_file_size(file_path, size),
+            'format': ext,
             'features': [],
             'sample_data': {},
             'applicable_operations': []
         }
 
         try:
-            import pandas as pd
-
-            ext = Path(file_path).suffix.lower()
+            pd = _pandas()
 
             # Read only first N rows for sampling
             sample_size = 100
 
             if ext == '.csv':
                 df = pd.read_csv(file_path, nrows=sample_size)
-            elif ext in ['.xlsx', '.xls']:
+            elif ext in {'.xlsx', '.xls'}:
+                # pandas opens .xlsx read-only and stops after nrows
                 df = pd.read_excel(file_path, nrows=sample_size)
             elif ext == '.parquet':
-                df = pd.read_parquet(file_path)[:sample_size]
-            elif ext in ['.tsv', '.txt']:
+                df = TabularAnalyzer._read_parquet_sample(file_path, sample_size)
+            elif ext in {'.tsv', '.txt'}:
                 df = pd.read_csv(file_path, sep='\t', nrows=sample_size)
             else:
                 raise ValueError(f"Unsupported format: {ext}")
@@ -367,28 +648,36 @@ class TabularAnalyzer(DataAnalyzer):
             metadata['row_count_sample'] = len(df)
             metadata['column_count'] = len(df.columns)
 
+            # Null counts, numeric stats and head samples in one vectorized pass each
+            nulls = df.isnull().sum()
+            all_null = nulls == len(df)
+            numeric = df[[col for col, dtype in df.dtypes.items() if dtype in TabularAnalyzer.NUMERIC_DTYPES]]
+            stats = numeric.agg(['min', 'max', 'mean']) if len(numeric.columns) else numeric
+            head_samples = df.head(5).to_dict(orient='list')
+
             # Analyze each column
             features = []
             sample_data = {}
 
-            for col in df.columns:
+            for col, dtype in df.dtypes.items():
                 col_info = {
                     'name': col,
-                    'dtype': str(df[col].dtype),
-                    'null_count': int(df[col].isnull().sum()),
-                    'null_percentage': round(df[col].isnull().sum() / len(df) * 100, 2)
+                    'dtype': str(dtype),
+                    'null_count': int(nulls[col]),
+                    'null_percentage': round(nulls[col] / len(df) * 100, 2)
                 }
 
                 # Categorical or numerical analysis
-                if df[col].dtype in ['object', 'category']:
-                    unique_values = df[col].dropna().unique()
+                if pd.api.types.is_object_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+                    unique_values = pd.unique(df[col].dropna().values)
                     col_info['unique_count'] = len(unique_values)
                     sample_data[col] = list(unique_values[:10])  # First 10 unique values
-                elif df[col].dtype in ['int64', 'float64', 'int32', 'float32']:
-                    col_info['min'] = float(df[col].min()) if not df[col].isnull().all() else None
-                    col_info['max'] = float(df[col].max()) if not df[col].isnull().all() else None
-                    col_info['mean'] = float(df[col].mean()) if not df[col].isnull().all() else None
-                    sample_data[col] = [float(df[col].iloc[i]) for i in range(min(5, len(df))) if not pd.isna(df[col].iloc[i])]
+                elif col in stats.columns:
+                    has_values = not all_null[col]
+                    col_info['min'] = float(stats.at['min', col]) if has_values else None
+                    col_info['max'] = float(stats.at['max', col]) if has_values else None
+                    col_info['mean'] = float(stats.at['mean', col]) if has_values else None
+                    sample_data[col] = [float(v) for v in head_samples[col] if not pd.isna(v)]
 
                 features.append(col_info)
 
@@ -408,6 +697,17 @@ class TabularAnalyzer(DataAnalyzer):
 
         return metadata
 
+    @staticmethod
+    def _read_parquet_sample(file_path: str, sample_size: int):
+        """Read the first rows of a parquet file without loading the whole table"""
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(file_path)
+        batch = next(parquet_file.iter_batches(batch_size=sample_size), None)
+        if batch is None:
+            return parquet_file.schema_arrow.empty_table().to_pandas()
+        return batch.to_pandas()
+
     @staticmethod
     def _get_tabular_operations(features: List[Dict], df) -> List[str]:
         """Determine applicable tabular operations based on data characteristics"""
@@ -421,10 +721,18 @@ class TabularAnalyzer(DataAnalyzer):
             'Export to different format'
         ])
 
-        # Identify column types
-        categorical_cols = [f['name'] for f in features if f['dtype'] in ['object', 'category']]
-        numerical_cols = [f['name'] for f in features if 'int' in f['dtype'] or 'float' in f['dtype']]
-        cols_with_nulls = [f['name'] for f in features if f['null_count'] > 0]
+        # Identify column types in a single pass over the features
+        categorical_cols = []
+        numerical_cols = []
+        cols_with_nulls = []
+        for f in features:
+            dtype = f['dtype']
+            if dtype in {'object', 'category'}:
+                categorical_cols.append(f['name'])
+            elif 'int' in dtype or 'float' in dtype:
+                numerical_cols.append(f['name'])
+            if f['null_count'] > 0:
+                cols_with_nulls.append(f['name'])
 
         # Categorical operations
         if categorical_cols:
@@ -453,15 +761,18 @@ class TabularAnalyzer(DataAnalyzer):
                 'Create calculated/derived columns'
             ])
 
+        # Lowercase column names once for the name-based checks below
+        lowered = [(col, str(col).lower()) for col in df.columns]
+
         # Time series operations if datetime columns detected
-        datetime_cols = [col for col in df.columns if 'date' in col.lower() or 'time' in col.lower()]
+        datetime_cols = [col for col, name in lowered if 'date' in name or 'time' in name]
         if datetime_cols:
             operations.append(f'Time series analysis on: {", ".join(datetime_cols[:2])}')
             operations.append(f'Temporal aggregation (daily, monthly, yearly)')
 
         # Spatial join if lat/lon columns exist
-        lat_cols = [col for col in df.columns if 'lat' in col.lower() or 'y' in col.lower()]
-        lon_cols = [col for col in df.columns if 'lon' in col.lower() or 'x' in col.lower()]
+        lat_cols = [col for col, name in lowered if 'lat' in name or 'y' in name]
+        lon_cols = [col for col, name in lowered if 'lon' in name or 'x' in name]
         if lat_cols and lon_cols:
             operations.append(f'Convert to geospatial data using: {lat_cols[0]}, {lon_cols[0]}')
             operations.append('Spatial join with geographic layers')
@@ -472,28 +783,30 @@ class TabularAnalyzer(DataAnalyzer):
 class DocumentAnalyzer(DataAnalyzer):
     """Analyzer for document formats"""
 
-    SUPPORTED_FORMATS = ['.pdf', '.docx', '.doc', '.txt', '.md']
+    SUPPORTED_FORMATS = frozenset({'.pdf', '.docx', '.doc', '.txt', '.md'})
+
+    LIBRARIES = {'.pdf': (_pdf_library,), '.docx': (_docx,)}
 
     @staticmethod
-    def analyze(file_path: str) -> Dict[str, Any]:
+    def analyze(file_path: str, size: Optional[int] = None) -> Dict[str, Any]:
         """Analyze document files"""
+        ext = Path(file_path).suffix.lower()
+
         metadata = {
             'data_type': 'document',
-            'file_size': DataAnalyzer.get_file_size(file_path),
-            'format': Path(file_path).suffix.lower(),
+            'file_size': DataAnalyzer.get_file_size(file_path, size),
+            'format': ext,
             'features': [],
             'sample_data': {},
             'applicable_operations': []
         }
 
-        ext = Path(file_path).suffix.lower()
-
         try:
             if ext == '.pdf':
                 metadata.update(DocumentAnalyzer._analyze_pdf(file_path))
             elif ext == '.docx':
                 metadata.update(DocumentAnalyzer._analyze_docx(file_path))
-            elif ext in ['.txt', '.md']:
+            elif ext in {'.txt', '.md'}:
                 metadata.update(DocumentAnalyzer._analyze_text(file_path))
             else:
                 metadata['error'] = f"Unsupported document format: {ext}"
@@ -509,29 +822,24 @@ class DocumentAnalyzer(DataAnalyzer):
         result = {}
 
         try:
-            import PyPDF2
-
-            with open(file_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                result['page_count'] = len(reader.pages)
+            result['page_count'], first_page_text = DocumentAnalyzer._read_pdf_preview(file_path)
 
-                # Extract text from first page only
-                first_page_text = reader.pages[0].extract_text()
-                result['sample_data'] = {
-                    'first_page_preview': first_page_text[:500] + '...' if len(first_page_text) > 500 else first_page_text
-                }
+            # Extract text from first page only
+            result['sample_data'] = {
+                'first_page_preview': first_page_text[:500] + '...' if len(first_page_text) > 500 else first_page_text
+            }
 
-                result['features'] = ['text_content', 'pages']
-                result['applicable_operations'] = [
-                    'Extract full text content',
-                    'Extract text from specific pages',
-                    'Keyword search and extraction',
-                    'Text summarization (LLM)',
-                    'Entity extraction (locations, organizations, dates)',
-                    'Topic modeling',
-                    'Convert to structured data (tables)',
-                    'Merge with other PDFs'
-                ]
+            result['features'] = ['text_content', 'pages']
+            result['applicable_operations'] = [
+                'Extract full text content',
+                'Extract text from specific pages',
+                'Keyword search and extraction',
+                'Text summarization (LLM)',
+                'Entity extraction (locations, organizations, dates)',
+                'Topic modeling',
+                'Convert to structured data (tables)',
+                'Merge with other PDFs'
+            ]
 
         except ImportError:
             result['error'] = 'PyPDF2 not installed. Install with: pip install PyPDF2'
@@ -541,13 +849,33 @@ class DocumentAnalyzer(DataAnalyzer):
 
         return result
 
+    @staticmethod
+    def _read_pdf_preview(file_path: str) -> tuple:
+        """Page count and first-page text, using PDFium when installed and PyPDF2 otherwise"""
+        try:
+            pdfium = _pypdfium2()
+        except ImportError:
+            PyPDF2 = _pypdf2()
+            with open(file_path, 'rb') as file:
+                reader = PyPDF2.PdfReader(file)
+                return len(reader.pages), reader.pages[0].extract_text()
+
+        with _PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(file_path)
+            try:
+                text = pdf[0].get_textpage().get_text_range()
+                return len(pdf), text.replace('\r\n', '\n')
+            finally:
+                # Also closes the page and text page
+                pdf.close()
+
     @staticmethod
     def _analyze_docx(file_path: str) -> Dict[str, Any]:
         """Analyze DOCX document"""
         result = {}
 
         try:
-            import docx
+            docx = _docx()
 
             doc = docx.Document(file_path)
             result['paragraph_count'] = len(doc.paragraphs)
@@ -585,26 +913,29 @@ class DocumentAnalyzer(DataAnalyzer):
         result = {}
 
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-                # Read only first 10KB
-                content = file.read(10240)
-                lines = content.split('\n')
+            # Read only first 10KB as raw bytes and decode once
+            with open(file_path, 'rb') as file:
+                content = file.read(10240).decode('utf-8', errors='ignore')
 
-                result['line_count_sample'] = len(lines)
-                result['sample_data'] = {
-                    'preview': content[:500] + '...' if len(content) > 500 else content
-                }
+            # Normalize line endings as text mode would
+            if '\r' in content:
+                content = content.replace('\r\n', '\n').replace('\r', '\n')
 
-                result['features'] = ['text_content']
-                result['applicable_operations'] = [
-                    'Full text search',
-                    'Keyword extraction',
-                    'Text summarization (LLM)',
-                    'Entity extraction (locations, organizations, dates)',
-                    'Sentiment analysis',
-                    'Topic modeling',
-                    'Convert to structured format (JSON, CSV)'
-                ]
+            result['line_count_sample'] = content.count('\n') + 1
+            result['sample_data'] = {
+                'preview': content[:500] + '...' if len(content) > 500 else content
+            }
+
+            result['features'] = ['text_content']
+            result['applicable_operations'] = [
+                'Full text search',
+                'Keyword extraction',
+                'Text summarization (LLM)',
+                'Entity extraction (locations, organizations, dates)',
+                'Sentiment analysis',
+                'Topic modeling',
+                'Convert to structured format (JSON, CSV)'
+            ]
 
         except Exception as e:
             result['error'] = f"Text analysis failed: {str(e)}"
@@ -615,13 +946,35 @@ class DocumentAnalyzer(DataAnalyzer):
 class MetadataScanner:
     """Main scanner class that orchestrates directory scanning and metadata extraction"""
 
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None, use_threads: bool = False,
+                 cache_file: Optional[str] = None):
+        """
+        Initialize scanner
+
+        Args:
+            max_workers: Number of workers for large scans (defaults to CPU count)
+            use_threads: Use a thread pool instead of processes, for I/O-bound scans
+                (e.g. mostly text documents) where startup and pickling dominate;
+                PDFium calls are serialized across threads
+            cache_file: Optional SQLite file caching per-file results across scans,
+                keyed by (path, mtime, size)
+        """
+        self.max_workers = max_workers or os.cpu_count()
+        self.use_threads = use_threads
+        self.cache_file = cache_file
         self.analyzers = {
             'geospatial': GeospatialAnalyzer,
             'tabular': TabularAnalyzer,
             'document': DocumentAnalyzer
         }
 
+        # Extension -> analyzer; earlier analyzers win shared extensions (.txt is tabular)
+        self._ext_map = {}
+        for analyzer in (GeospatialAnalyzer, TabularAnalyzer, DocumentAnalyzer):
+            for ext in analyzer.SUPPORTED_FORMATS:
+                self._ext_map.setdefault(ext, analyzer)
+        self._all_exts = frozenset(self._ext_map)
+
     def scan_directory(self, directory_path: str, output_file: Optional[str] = None) -> Dict[str, Any]:
         """
         Scan directory and extract metadata for all supported data files
@@ -644,47 +997,138 @@ class MetadataScanner:
             'files': []
         }
 
-        # Find all supported files
-        supported_extensions = (
-            GeospatialAnalyzer.SUPPORTED_FORMATS +
-            TabularAnalyzer.SUPPORTED_FORMATS +
-            DocumentAnalyzer.SUPPORTED_FORMATS
-        )
+        # Find all supported files; only matching entries are stat'ed. Walking from the
+        # absolute root keys the cache the same however the directory was spelled
+        file_paths = []
+        mtimes = []
+        sizes = []
+        exts = []
+        for entry in _iter_files(os.path.abspath(directory_path)):
+            ext = _file_extension(entry.name)
+            if ext in self._all_exts:
+                stat = entry.stat()
+                file_paths.append(entry.path)
+                mtimes.append(stat.st_mtime)
+                sizes.append(stat.st_size)
+                exts.append(ext)
+
+        # Unchanged files are served from the cache; only the rest are analyzed
+        cache = self._open_cache() if self.cache_file else None
+        results = [None] * len(file_paths)
+        if cache is not None:
+            for idx, key in enumerate(zip(file_paths, mtimes, sizes)):
+                row = cache.execute(
+                    'SELECT json FROM cache WHERE path = ? AND mtime = ? AND size = ?', key
+                ).fetchone()
+                if row is not None:
+                    results[idx] = orjson.loads(row[0])
+        pending = [idx for idx, result in enumerate(results) if result is None]
+        if cache is not None and len(pending) < len(results):
+            print(f"Reusing cached metadata for {len(results) - len(pending)} unchanged files")
+
+        pending_paths = [file_paths[idx] for idx in pending]
+        pending_mtimes = [mtimes[idx] for idx in pending]
+        pending_sizes = [sizes[idx] for idx in pending]
+        pending_exts = [exts[idx] for idx in pending]
+
+        # Files are independent, so analyze them across processes for large trees
+        if len(pending) > PARALLEL_SCAN_THRESHOLD and self.max_workers > 1:
+            # Workers import only the libraries the pending extensions actually need
+            loaders = tuple({
+                loader: None for ext in dict.fromkeys(pending_exts)
+                for loader in self._ext_map[ext].LIBRARIES.get(ext, ())
+            })
+            pool_class = ThreadPoolExecutor if self.use_threads else ProcessPoolExecutor
+            with pool_class(max_workers=self.max_workers, initializer=_warm_imports,
+                            initargs=(loaders,)) as executor:
+                analyzed = list(executor.map(self._analyze_file, pending_paths, pending_mtimes,
+                                             pending_exts, pending_sizes, chunksize=8))
+        else:
+            analyzed = [
+                self._analyze_file(file_path, mtime, ext, size)
+                for file_path, mtime, ext, size in zip(pending_paths, pending_mtimes,
+                                                       pending_exts, pending_sizes)
+            ]
+
+        for idx, file_metadata in zip(pending, analyzed):
+            results[idx] = file_metadata
+
+        if cache is not None:
+            # Failed analyses (e.g. a missing library) are retried on the next scan
+            try:
+                with cache:
+                    cache.executemany(
+                        'INSERT OR REPLACE INTO cache (path, mtime, size, json) VALUES (?, ?, ?, ?)',
+                        [
+                            (file_paths[idx], mtimes[idx], sizes[idx],
+                             orjson.dumps(results[idx], default=_json_default,
+                                          option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS))
+                            for idx in pending if 'error' not in results[idx]
+                        ]
+                    )
+            except sqlite3.Error as e:
+                print(f"Warning: Could not update scan cache - {str(e)}")
+            cache.close()
+
+        metadata['files'] = results
 
-        for file_path in directory_path.rglob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in supported_extensions:
-                print(f"Analyzing: {file_path.name}")
-                file_metadata = self._analyze_file(str(file_path))
-                metadata['files'].append(file_metadata)
+        # Lat/lon bounds are converted afterwards, batched per CRS
+        GeospatialAnalyzer.assign_bounds_latlon(metadata['files'])
 
         metadata['total_files'] = len(metadata['files'])
 
         # Save to JSON if output file specified
         if output_file:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=2, ensure_ascii=False)
+            Path(output_file).write_bytes(orjson.dumps(metadata, default=_json_default, option=JSON_OPTS))
             print(f"\nMetadata saved to: {output_file}")
 
         return metadata
 
-    def _analyze_file(self, file_path: str) -> Dict[str, Any]:
-        """Analyze a single file and return metadata"""
+    def _open_cache(self) -> Optional[sqlite3.Connection]:
+        """Open the per-file result cache, creating its table if needed"""
+        try:
+            cache = sqlite3.connect(self.cache_file)
+            # WAL lets concurrent scans read while another one writes
+            cache.execute('PRAGMA journal_mode=WAL')
+            cache.execute(
+                'CREATE TABLE IF NOT EXISTS cache '
+                '(path TEXT PRIMARY KEY, mtime REAL, size INTEGER, json BLOB)'
+            )
+            return cache
+        except sqlite3.Error as e:
+            print(f"Warning: Could not open scan cache {self.cache_file} - {str(e)}")
+            return None
+
+    def _analyze_file(self, file_path: str, mtime: Optional[float] = None,
+                      ext: Optional[str] = None, size: Optional[int] = None) -> Dict[str, Any]:
+        """Analyze a single file and return metadata
+
+        Args:
+            file_path: Path to the file
+            mtime: Modification time already known from the directory walk
+            ext: Lowercase extension already known from the directory walk
+            size: Size in bytes already known from the directory walk
+        """
+        path = Path(file_path)
+        print(f"Analyzing: {path.name}")
+
+        if mtime is None:
+            mtime = os.path.getmtime(file_path)
+        if ext is None:
+            ext = path.suffix.lower()
+
         file_metadata = {
-            'file_path': str(Path(file_path).absolute()),
-            'file_name': Path(file_path).name,
-            'file_extension': Path(file_path).suffix.lower(),
-            'last_modified': datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
+            'file_path': str(path.absolute()),
+            'file_name': path.name,
+            'file_extension': ext,
+            'last_modified': datetime.fromtimestamp(mtime).isoformat()
         }
 
         # Determine analyzer type
-        ext = Path(file_path).suffix.lower()
+        analyzer = self._ext_map.get(ext)
 
-        if ext in GeospatialAnalyzer.SUPPORTED_FORMATS:
-            analysis = GeospatialAnalyzer.analyze(file_path)
-        elif ext in TabularAnalyzer.SUPPORTED_FORMATS:
-            analysis = TabularAnalyzer.analyze(file_path)
-        elif ext in DocumentAnalyzer.SUPPORTED_FORMATS:
-            analysis = DocumentAnalyzer.analyze(file_path)
+        if analyzer is not None:
+            analysis = analyzer.analyze(file_path, size)
         else:
             analysis = {
                 'data_type': 'unknown',
@@ -702,10 +1146,14 @@ def main():
     parser = argparse.ArgumentParser(description='Scan directory and extract metadata from data files')
     parser.add_argument('directory', help='Directory path to scan')
     parser.add_argument('-o', '--output', help='Output JSON file path', default='metadata_output.json')
+    parser.add_argument('-j', '--workers', type=int, help='Number of parallel workers (defaults to CPU count)')
+    parser.add_argument('--threads', action='store_true',
+                       help='Analyze files in threads instead of processes')
+    parser.add_argument('--cache', help='SQLite file for reusing results of unchanged files across scans')
 
     args = parser.parse_args()
 
-    scanner = MetadataScanner()
+    scanner = MetadataScanner(max_workers=args.workers, use_threads=args.threads, cache_file=args.cache)
 
     print(f"Scanning directory: {args.directory}")
     print("=" * 60)
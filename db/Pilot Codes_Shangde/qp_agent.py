@@ -3,21 +3,155 @@ Query Processing Agent (QP)
 Processes human queries and generates structured analysis specifications
 """
 
-import json
-import ollama
+import asyncio
+import hashlib
+import heapq
+import os
+import pickle
+import re
+import sys
+import tempfile
+import orjson
+from ollama import AsyncClient
+from bisect import bisect_right
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from rdflib import Graph, Namespace, URIRef
 from rdflib.namespace import RDF, RDFS
+from rdflib.plugins.sparql import prepareQuery
+from pathlib import Path
 from typing import Dict, List, Any, Optional
 from datetime import datetime
+from agent_common import REASONING_HEADROOM, load_cached_json, save_cached_json, think_setting
+
+try:
+    import ahocorasick
+except ImportError:
+    # Optional; labels contained in a term are then found with plain substring tests
+    ahocorasick = None
+
+
+ONTO = Namespace("http://urbanplanning.org/ontology#")
+
+# The parse prompt and its reply are short; a small deterministic context is enough
+PARSE_OPTIONS = {'num_ctx': 2048, 'temperature': 0}
+
+# Workflow replies are grammar-constrained to JSON and deterministic (greedy decoding).
+# Generation budget: a 10-step reply in WORKFLOW_SCHEMA's shape with sentence-long
+# operations and methods (~60 tokens per step) plus sufficiency, missing data and
+# alternatives comes to ~680 tokens
+WORKFLOW_OPTIONS = {'temperature': 0, 'top_k': 1, 'num_predict': 768, 'num_ctx': 4096}
+
+# The model details are only logged, so a slow server must not hold up the first query
+SHOW_TIMEOUT = 2.0
+
+# One-line shape of the workflow reply; compact so the prompt prefills faster
+WORKFLOW_SCHEMA = ('{"steps":[{"step":1,"operation":"...","data_source":"...","method":"..."}],'
+                   '"data_sufficiency":"sufficient|partial|insufficient","missing_data":["..."],'
+                   '"alternatives":"..."}')
+
+# "LABEL: value" lines of the parse reply
+LABEL_RE = re.compile(r'^[ \t]*(CONCEPTS|ENTITIES|FILTERS|SPATIAL|INTENT):(.*)$', re.MULTILINE)
+
+# SPARQL queries parsed once; per-call values are supplied through initBindings
+RELATIONS_QUERY = prepareQuery("""
+    SELECT ?relation ?target
+    WHERE {
+        ?subject ?relation ?target .
+    }
+""")
+
+METHODS_QUERY = prepareQuery("""
+    SELECT ?method
+    WHERE {
+        ?method a :AnalysisMethod .
+        ?method :appliesTo ?entity .
+    }
+""", initNs={'': ONTO})
+
+TERMS_QUERY = prepareQuery("""
+    SELECT ?term ?label
+    WHERE {
+        ?term a ?termType .
+        ?term rdfs:label ?label .
+    }
+""", initNs={'rdfs': RDFS})
+
+
+# Search structures built from the knowledge base, persisted together in the index cache
+INDEX_ATTRS = ('_ds_represents', '_ds_domain', '_ds_geometry', '_ds_tasks', '_ds_task_names',
+               '_concept_idx', '_entity_idx', '_task_idx', '_polygon_ids', '_point_ids')
+
+# Ontology term types that query concepts and entities are matched against
+CONCEPT_TYPE = 'PlanningConcept'
+ENTITY_TYPE = 'UrbanEntity'
+
+# Only the best-scoring datasets are used in the spec (10) and the workflow prompt (5)
+TOP_DATASETS = 10
+
+# Reasons are recorded as (kind, value) while scoring and formatted only for the top datasets
+REASON_FORMATS = {
+    'concept': "Matches concept: {}",
+    'entity': "Contains entity: {}",
+    'geometry': "Geometry matches entity type",
+    'task': "Capable of related task: {}",
+}
+
+# Length of the character n-grams in the dataset search index
+NGRAM = 3
+
+
+def _ngrams(text: str) -> set:
+    """Character n-grams of a lowercased string, interned so all indexes share one key object"""
+    return {sys.intern(text[i:i + NGRAM]) for i in range(len(text) - NGRAM + 1)}
+
+
+def _add_postings(index: Dict[str, set], text: str, dataset_idx: int) -> None:
+    """Record that every n-gram of text occurs in the given dataset"""
+    for gram in _ngrams(text):
+        index.setdefault(gram, set()).add(dataset_idx)
+
+
+@lru_cache(maxsize=8)
+def _load_ontology(ontology_file: str, mtime: float) -> Graph:
+    """Parse the ontology once per file version; mtime invalidates the cache on edits"""
+    ontology = Graph()
+
+    # Reloading pickled triples is much faster than tokenizing the Turtle source
+    pickle_file = os.path.splitext(ontology_file)[0] + '.pkl'
+    try:
+        with open(pickle_file, 'rb') as f:
+            cached = pickle.load(f)
+        if cached['mtime'] == mtime:
+            ontology.addN((s, p, o, ontology) for s, p, o in cached['triples'])
+            return ontology
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, TypeError):
+        pass
+
+    ontology.parse(ontology_file, format='turtle')
+
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(pickle_file) or '.', suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump({'mtime': mtime, 'triples': list(ontology)}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, pickle_file)
+    except OSError as e:
+        print(f"  Warning: Could not cache ontology - {str(e)}")
+
+    return ontology
 
 
 class QueryProcessingAgent:
     """Main QP class that handles query understanding and analysis generation"""
 
     def __init__(self,
-                 knowledge_base_file: str,
+                 knowledge_base_file: Optional[str] = None,
                  ontology_file: str = "planning_ontology.ttl",
-                 model_name: str = "gpt-oss:20b"):
+                 model_name: str = "gpt-oss:20b",
+                 knowledge_base: Optional[Dict[str, Any]] = None,
+                 concurrency: int = 4,
+                 index_cache_file: Optional[str] = "outputs/.qp_cache/qp_index.pkl"):
         """
         Initialize QP agent
 
@@ -25,23 +159,169 @@ class QueryProcessingAgent:
             knowledge_base_file: Path to MDA's knowledge_base.json
             ontology_file: Path to planning ontology RDF file
             model_name: Ollama model name
+            knowledge_base: Already loaded knowledge base; skips reading knowledge_base_file
+            concurrency: Maximum number of in-flight LLM requests (match OLLAMA_NUM_PARALLEL)
+            index_cache_file: Pickle of the compiled search indexes, reused while the
+                knowledge base and ontology are unchanged; None disables it
         """
         self.model_name = model_name
-
-        # Load knowledge base
-        print(f"[QP] Loading knowledge base: {knowledge_base_file}")
-        with open(knowledge_base_file, 'r', encoding='utf-8') as f:
-            self.knowledge_base = json.load(f)
-
-        # Load ontology
+        self.concurrency = concurrency
+        self._think = think_setting(model_name)
+        self._workflow_options = dict(WORKFLOW_OPTIONS)
+        if self._think:
+            self._workflow_options['num_predict'] += REASONING_HEADROOM
+        # LLM client, its semaphore and the worker threads live as long as the agent
+        # (until close()), so connections are reused across process_query calls
+        self.client = None
+        self._semaphore = None
+        self._client_loop = None
+        self._loop = None
+        self._executor = None
+        self._quantization_logged = False
+        self._parse_memo = {}
+        self._workflow_memo = {}
+
+        # Load knowledge base; the fingerprint identifies its version in cached specs
+        if knowledge_base is not None:
+            self.knowledge_base = knowledge_base
+            kb_fingerprint = hashlib.blake2b(orjson.dumps(
+                knowledge_base, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str
+            ), digest_size=16).hexdigest()
+        else:
+            print(f"[QP] Loading knowledge base: {knowledge_base_file}")
+            self.knowledge_base = orjson.loads(Path(knowledge_base_file).read_bytes())
+            stat = os.stat(knowledge_base_file)
+            kb_fingerprint = f"{os.path.abspath(knowledge_base_file)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+        # Load ontology (parsed graphs are shared between agents)
         print(f"[QP] Loading planning ontology: {ontology_file}")
-        self.ontology = Graph()
-        self.ontology.parse(ontology_file, format='turtle')
-        self.onto = Namespace("http://urbanplanning.org/ontology#")
+        self.ontology = _load_ontology(ontology_file, os.path.getmtime(ontology_file))
+        stat = os.stat(ontology_file)
+        sources = '|'.join([kb_fingerprint, os.path.abspath(ontology_file), str(stat.st_mtime_ns), str(stat.st_size)])
+        self._spec_key_prefix = f"{model_name}|{sources}"
+        self.onto = ONTO
+        self._fuzzy_memo = {}
+        self._label_index = {}
+
+        # Build the search indexes, or reuse them from a run on the same sources
+        index_key = hashlib.blake2b(sources.encode('utf-8'), digest_size=16).hexdigest()
+        if not self._load_indexes(index_cache_file, index_key):
+            self._prepare_datasets()
+            for term_type in (CONCEPT_TYPE, ENTITY_TYPE):
+                self._ontology_labels(term_type)
+            self._save_indexes(index_cache_file, index_key)
 
         print(f"[QP] Loaded {len(self.knowledge_base['datasets'])} datasets")
         print(f"[QP] Loaded {len(self.ontology)} ontology triples")
 
+    async def _log_quantization(self) -> None:
+        """Report the quantization of the pulled model weights (e.g. MXFP4, Q4_K_M, F16)"""
+        try:
+            response = await asyncio.wait_for(self.client.show(self.model_name), SHOW_TIMEOUT)
+            print(f"[QP] Model {self.model_name} quantization: {response['details']['quantization_level']}")
+        except Exception as e:
+            print(f"  Warning: Could not read model details - {str(e) or type(e).__name__}")
+
+    def _load_indexes(self, index_cache_file: Optional[str], index_key: str) -> bool:
+        """Restore search indexes pickled for the same sources; False if there are none"""
+        if not index_cache_file:
+            return False
+        try:
+            with open(index_cache_file, 'rb') as f:
+                cached = pickle.load(f)
+            if cached['key'] != index_key:
+                return False
+            for attr in INDEX_ATTRS:
+                setattr(self, attr, cached['datasets'][attr])
+            self._label_index = cached['labels']
+            return True
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError, TypeError, ImportError, AttributeError):
+            return False
+
+    def _save_indexes(self, index_cache_file: Optional[str], index_key: str) -> None:
+        """Atomically pickle the search indexes for later runs"""
+        if not index_cache_file:
+            return
+        cached = {
+            'key': index_key,
+            'datasets': {attr: getattr(self, attr) for attr in INDEX_ATTRS},
+            'labels': self._label_index
+        }
+        try:
+            cache_dir = os.path.dirname(index_cache_file) or '.'
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, index_cache_file)
+        except (OSError, pickle.PicklingError) as e:
+            print(f"  Warning: Could not cache search indexes - {str(e)}")
+
+    def _prepare_datasets(self) -> None:
+        """
+        Extract lowercased search fields and build the search index
+
+        Fields are kept in parallel lists indexed by dataset position, so searches
+        index flat lists instead of walking nested dataset dicts. Each index maps
+        a character n-gram to the datasets whose field contains it. Any substring
+        of a field shares all its n-grams with that field, so intersecting
+        postings gives a superset of the matches and a query only substring-tests
+        those candidates.
+        """
+        self._ds_represents = []
+        self._ds_domain = []
+        self._ds_geometry = []
+        self._ds_tasks = []
+        self._ds_task_names = []
+        self._concept_idx = {}
+        self._entity_idx = {}
+        self._task_idx = {}
+        self._polygon_ids = set()
+        self._point_ids = set()
+
+        for i, dataset in enumerate(self.knowledge_base['datasets']):
+            semantic = dataset.get('semantic_context', {})
+            # Domains, geometry types and tasks repeat across datasets; interning
+            # keeps one copy of each
+            represents = sys.intern(semantic.get('represents', '').lower())
+            domain = sys.intern(semantic.get('domain', '').lower())
+            geometry = sys.intern(dataset.get('spatial_context', {}).get('geometry_type', '').lower())
+            task_names = tuple(dataset.get('capable_tasks', []))
+            tasks = tuple(sys.intern(task.lower()) for task in task_names)
+
+            self._ds_represents.append(represents)
+            self._ds_domain.append(domain)
+            self._ds_geometry.append(geometry)
+            self._ds_tasks.append(tasks)
+            self._ds_task_names.append(task_names)
+
+            # Concepts match domain or representation, entities only the representation
+            _add_postings(self._concept_idx, domain, i)
+            _add_postings(self._concept_idx, represents, i)
+            _add_postings(self._entity_idx, represents, i)
+            for task_lower in tasks:
+                _add_postings(self._task_idx, task_lower, i)
+
+            if 'polygon' in geometry:
+                self._polygon_ids.add(i)
+            if 'point' in geometry:
+                self._point_ids.add(i)
+
+    def _candidates(self, index: Dict[str, set], term: str) -> set:
+        """Datasets that may contain term, according to an n-gram index"""
+        if len(term) < NGRAM:
+            # Too short to have an n-gram; every dataset is a candidate
+            return set(range(len(self.knowledge_base['datasets'])))
+
+        postings = []
+        for gram in _ngrams(term):
+            if gram not in index:
+                return set()
+            postings.append(index[gram])
+
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:])
+
     def process_query(self, query: str, output_file: str = "outputs/analysis_spec.json") -> Dict[str, Any]:
         """
         Main query processing pipeline
@@ -53,37 +333,141 @@ class QueryProcessingAgent:
         Returns:
             Structured analysis specification
         """
+        return self.process_queries([query], [output_file])[0]
+
+    def process_queries(self, queries: List[str],
+                        output_files: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Process several queries concurrently
+
+        All prompts are submitted at once so the Ollama server can batch them;
+        batches of 32-64 queries keep it busiest. In-flight requests are capped
+        by the agent's concurrency.
+
+        Args:
+            queries: Human language queries
+            output_files: Path to save each analysis specification; defaults to
+                outputs/analysis_spec_<n>.json
+
+        Returns:
+            Structured analysis specifications, in query order
+        """
+        # One event loop serves every call, so the client it is bound to stays usable
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(self.process_queries_async(queries, output_files))
+
+    async def process_queries_async(self, queries: List[str],
+                                    output_files: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Async variant of process_queries(); release the client with aclose() when done"""
+        # Client and semaphore are bound to the event loop they are created on
+        loop = asyncio.get_running_loop()
+        if self._client_loop is not loop:
+            self.client = AsyncClient()
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._client_loop = loop
+
+        # Logged on the first request rather than at construction, which needs no server
+        if not self._quantization_logged:
+            self._quantization_logged = True
+            await self._log_quantization()
+
+        # Ontology activation and search run on worker threads, so they neither
+        # block the event loop nor wait for each other
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+        if output_files is None:
+            output_files = [f"outputs/analysis_spec_{i + 1}.json" for i in range(len(queries))]
+
+        return await asyncio.gather(*(
+            self._process_query_async(query, output_file)
+            for query, output_file in zip(queries, output_files)
+        ))
+
+    async def aclose(self) -> None:
+        """Close the LLM client and worker threads; await on the loop that ran the queries"""
+        if self.client is not None:
+            await self.client.close()
+        self.client = None
+        self._semaphore = None
+        self._client_loop = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def close(self) -> None:
+        """Close the LLM client, worker threads and event loop used by process_query(ies)"""
+        if self._loop is not None:
+            self._loop.run_until_complete(self.aclose())
+            self._loop.close()
+            self._loop = None
+        elif self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    async def _process_query_async(self, query: str, output_file: str) -> Dict[str, Any]:
+        """Run the pipeline for one query, or reuse its cached specification"""
         print(f"\n[QP] Processing query: '{query}'")
         print("=" * 60)
 
+        # The pipeline is deterministic for a query, model, knowledge base and ontology
+        cache_dir = Path(output_file).parent / '.qp_cache'
+        spec_key = hashlib.blake2b(f"{self._spec_key_prefix}|{query}".encode('utf-8'), digest_size=16).hexdigest()
+        spec_cache_file = cache_dir / 'specs' / f"{spec_key}.json"
+        analysis_spec = load_cached_json(spec_cache_file)
+        if analysis_spec is not None:
+            print("[QP] Reusing cached analysis specification")
+            self._save_spec(analysis_spec, output_file)
+            return analysis_spec
+
         # Step 1: Parse query and extract key concepts
         print("[QP] Step 1: Parsing query...")
-        parsed_query = self._parse_query(query)
+        parsed_query = await self._parse_query(query)
 
         # Step 2: Activate relevant ontology subgraph
-        print("[QP] Step 2: Activating ontology...")
-        ontology_context = self._activate_ontology(parsed_query)
-
         # Step 3: Find relevant datasets from knowledge base
+        # Both depend only on the parsed query, so they run side by side
+        print("[QP] Step 2: Activating ontology...")
         print("[QP] Step 3: Searching for relevant data...")
-        relevant_data = self._search_knowledge_base(parsed_query)
+        loop = asyncio.get_running_loop()
+        ontology_context, relevant_data = await asyncio.gather(
+            loop.run_in_executor(self._executor, self._activate_ontology, parsed_query),
+            loop.run_in_executor(self._executor, self._search_knowledge_base, parsed_query)
+        )
 
         # Step 4: Generate analysis specification
         print("[QP] Step 4: Generating analysis specification...")
-        analysis_spec = self._generate_analysis_spec(
-            query, parsed_query, ontology_context, relevant_data
+        analysis_spec = await self._generate_analysis_spec(
+            query, parsed_query, ontology_context, relevant_data,
+            cache_dir=cache_dir,
+            # A query that failed to parse is retried next time rather than cached
+            spec_cache_file=spec_cache_file if query in self._parse_memo else None
         )
 
-        # Save output
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(analysis_spec, f, indent=2, ensure_ascii=False)
+        self._save_spec(analysis_spec, output_file)
+        return analysis_spec
+
+    @staticmethod
+    def _save_spec(analysis_spec: Dict[str, Any], output_file: str):
+        """Write an analysis specification to its output file"""
+        Path(output_file).write_bytes(orjson.dumps(analysis_spec, option=orjson.OPT_INDENT_2))
 
         print(f"\n[QP] Analysis specification saved to: {output_file}")
-        return analysis_spec
 
-    def _parse_query(self, query: str) -> Dict[str, Any]:
+    async def _parse_query(self, query: str) -> Dict[str, Any]:
         """Parse query to extract concepts, entities, filters, and intent"""
 
+        # Parsing is deterministic (temperature 0), so repeated queries reuse the result
+        if query in self._parse_memo:
+            return self._parse_memo[query]
+
         prompt = f"""Parse this urban planning query and extract key components:
 
 Query: "{query}"
@@ -103,12 +487,7 @@ SPATIAL: relationship
 INTENT: <one sentence describing what they want>"""
 
         try:
-            response = ollama.chat(
-                model=self.model_name,
-                messages=[{'role': 'user', 'content': prompt}]
-            )
-
-            content = response['message']['content']
+            content = await self._chat(prompt, options=PARSE_OPTIONS)
 
             # Parse response
             parsed = {
@@ -120,19 +499,16 @@ INTENT: <one sentence describing what they want>"""
                 'intent': ''
             }
 
-            for line in content.split('\n'):
-                line = line.strip()
-                if line.startswith('CONCEPTS:'):
-                    parsed['concepts'] = [c.strip() for c in line.split('CONCEPTS:')[1].split(',')]
-                elif line.startswith('ENTITIES:'):
-                    parsed['entities'] = [e.strip() for e in line.split('ENTITIES:')[1].split(',')]
-                elif line.startswith('FILTERS:'):
-                    parsed['filters'] = [f.strip() for f in line.split('FILTERS:')[1].split(',')]
-                elif line.startswith('SPATIAL:'):
-                    parsed['spatial_relationships'] = [line.split('SPATIAL:')[1].strip()]
-                elif line.startswith('INTENT:'):
-                    parsed['intent'] = line.split('INTENT:')[1].strip()
+            for match in LABEL_RE.finditer(content):
+                label, value = match.groups()
+                if label == 'SPATIAL':
+                    parsed['spatial_relationships'] = [value.strip()]
+                elif label == 'INTENT':
+                    parsed['intent'] = value.strip()
+                else:
+                    parsed[label.lower()] = [item.strip() for item in value.split(',')]
 
+            self._parse_memo[query] = parsed
             return parsed
 
         except Exception as e:
@@ -161,24 +537,18 @@ INTENT: <one sentence describing what they want>"""
 
         # Find matching concepts in ontology
         for concept in concepts:
-            concept_matches = self._fuzzy_match_ontology_term(concept, "PlanningConcept")
+            concept_matches = self._fuzzy_match_ontology_term(concept, CONCEPT_TYPE)
             activated_context['relevant_concepts'].extend(concept_matches)
 
         # Find matching entities
         for entity in entities:
-            entity_matches = self._fuzzy_match_ontology_term(entity, "UrbanEntity")
+            entity_matches = self._fuzzy_match_ontology_term(entity, ENTITY_TYPE)
             activated_context['relevant_entities'].extend(entity_matches)
 
         # Query relationships between activated concepts/entities
         for concept_uri in activated_context['relevant_concepts']:
             # Find what this concept relates to
-            relations = self.ontology.query(f"""
-                PREFIX : <http://urbanplanning.org/ontology#>
-                SELECT ?relation ?target
-                WHERE {{
-                    <{concept_uri}> ?relation ?target .
-                }}
-            """)
+            relations = self.ontology.query(RELATIONS_QUERY, initBindings={'subject': URIRef(concept_uri)})
 
             for row in relations:
                 activated_context['relationships'].append({
@@ -189,14 +559,7 @@ INTENT: <one sentence describing what they want>"""
 
         # Find applicable analysis methods
         for entity_uri in activated_context['relevant_entities']:
-            methods = self.ontology.query(f"""
-                PREFIX : <http://urbanplanning.org/ontology#>
-                SELECT ?method
-                WHERE {{
-                    ?method a :AnalysisMethod .
-                    ?method :appliesTo <{entity_uri}> .
-                }}
-            """)
+            methods = self.ontology.query(METHODS_QUERY, initBindings={'entity': URIRef(entity_uri)})
 
             for row in methods:
                 method_name = str(row.method).split('#')[-1]
@@ -205,100 +568,175 @@ INTENT: <one sentence describing what they want>"""
 
         return activated_context
 
-    def _fuzzy_match_ontology_term(self, term: str, term_type: str) -> List[str]:
-        """Fuzzy match query term to ontology concepts/entities"""
+    def _ontology_labels(self, term_type: str) -> Dict[str, Any]:
+        """
+        Lowercased labels of all ontology terms of a type, prepared for matching
 
-        term_lower = term.lower()
-        matches = []
+        Labels are joined into one NUL-separated string so str.find locates a term
+        inside any label in a single C-level scan, and an Aho-Corasick automaton
+        finds every label contained in a term in one pass over the term.
+        """
+        if term_type in self._label_index:
+            return self._label_index[term_type]
 
         # Query for all terms of given type
-        query_result = self.ontology.query(f"""
-            PREFIX : <http://urbanplanning.org/ontology#>
-            PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-            SELECT ?term ?label
-            WHERE {{
-                ?term a :{term_type} .
-                ?term rdfs:label ?label .
-            }}
-        """)
-
-        for row in query_result:
-            label = str(row.label).lower()
-            # Simple fuzzy matching
-            if term_lower in label or label in term_lower:
-                matches.append(str(row.term))
+        query_result = self.ontology.query(TERMS_QUERY, initBindings={'termType': self.onto[term_type]})
+        rows = [(str(row.label).lower(), str(row.term)) for row in query_result]
+
+        starts = []
+        offset = 0
+        for label, _ in rows:
+            starts.append(offset)
+            offset += len(label) + 1
+
+        automaton = None
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for i, (label, _) in enumerate(rows):
+                if not label:
+                    continue
+                # Several terms may share a label
+                if not automaton.exists(label):
+                    automaton.add_word(label, [])
+                automaton.get(label).append(i)
+            automaton.make_automaton()
+
+        labels = {
+            'labels': [label for label, _ in rows],
+            'terms': [term for _, term in rows],
+            'starts': starts,
+            'haystack': '\0'.join(label for label, _ in rows),
+            'automaton': automaton,
+            # An empty label is contained in every term
+            'empty': [i for i, (label, _) in enumerate(rows) if not label]
+        }
+        self._label_index[term_type] = labels
+        return labels
+
+    def _fuzzy_match_ontology_term(self, term: str, term_type: str) -> List[str]:
+        """Fuzzy match query term to ontology concepts/entities"""
+
+        # The same concept strings recur across queries against one ontology
+        key = (term, term_type)
+        if key in self._fuzzy_memo:
+            return self._fuzzy_memo[key]
 
+        term_lower = term.lower()
+        labels = self._ontology_labels(term_type)
+
+        # Simple fuzzy matching: the term occurs in a label or a label occurs in the term
+        if not term_lower:
+            hits = set(range(len(labels['terms'])))
+        else:
+            hits = set(labels['empty'])
+            haystack = labels['haystack']
+            pos = haystack.find(term_lower)
+            while pos != -1:
+                hits.add(bisect_right(labels['starts'], pos) - 1)
+                pos = haystack.find(term_lower, pos + 1)
+
+            if labels['automaton'] is not None:
+                for _, label_rows in labels['automaton'].iter(term_lower):
+                    hits.update(label_rows)
+            else:
+                hits.update(i for i, label in enumerate(labels['labels']) if label in term_lower)
+
+        # Keep the order the ontology returned the terms in
+        matches = [labels['terms'][i] for i in sorted(hits)]
+        self._fuzzy_memo[key] = matches
         return matches
 
     def _search_knowledge_base(self, parsed_query: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Search knowledge base for datasets matching query requirements"""
+        """Search knowledge base for the datasets best matching query requirements (at most TOP_DATASETS)"""
 
-        relevant_datasets = []
+        datasets = self.knowledge_base['datasets']
 
-        concepts = [c.lower() for c in parsed_query['concepts']]
-        entities = [e.lower() for e in parsed_query['entities']]
+        concepts = tuple(c.lower() for c in parsed_query['concepts'])
+        entities = tuple(e.lower() for e in parsed_query['entities'])
         intent = parsed_query['intent'].lower()
 
-        for dataset in self.knowledge_base['datasets']:
-            relevance_score = 0
-            reasons = []
+        # Dataset index -> [relevance score, reasons]; each pass below appends
+        # reasons in the same order a per-dataset scan would
+        scores = defaultdict(lambda: [0, []])
 
-            # Check semantic context match
-            semantic = dataset.get('semantic_context', {})
-            represents = semantic.get('represents', '').lower()
-            domain = semantic.get('domain', '').lower()
-
-            # Match concepts with domain
-            for concept in concepts:
-                if concept in domain or concept in represents:
-                    relevance_score += 2
-                    reasons.append(f"Matches concept: {concept}")
-
-            # Match entities with semantic representation
-            for entity in entities:
-                if entity in represents:
-                    relevance_score += 2
-                    reasons.append(f"Contains entity: {entity}")
-
-            # Check geometry type match
-            spatial_ctx = dataset.get('spatial_context', {})
-            geometry = spatial_ctx.get('geometry_type', '').lower()
-
-            for entity in entities:
-                if ('parcel' in entity or 'building' in entity) and 'polygon' in geometry:
-                    relevance_score += 1
-                    reasons.append("Geometry matches entity type")
-                elif ('transit' in entity or 'stop' in entity) and 'point' in geometry:
-                    relevance_score += 1
-                    reasons.append("Geometry matches entity type")
-
-            # Check capable tasks
-            capable_tasks = dataset.get('capable_tasks', [])
-            for task in capable_tasks:
-                task_lower = task.lower()
-                if any(concept in task_lower for concept in concepts):
-                    relevance_score += 1
-                    reasons.append(f"Capable of related task: {task}")
-
-            # Add dataset if relevant
-            if relevance_score > 0:
-                relevant_datasets.append({
-                    'dataset': dataset,
-                    'relevance_score': relevance_score,
-                    'reasons': reasons
-                })
+        # Match concepts with domain or semantic representation
+        for concept in concepts:
+            for i in sorted(self._candidates(self._concept_idx, concept)):
+                if concept in self._ds_domain[i] or concept in self._ds_represents[i]:
+                    entry = scores[i]
+                    entry[0] += 2
+                    entry[1].append(('concept', concept))
 
-        # Sort by relevance
-        relevant_datasets.sort(key=lambda x: x['relevance_score'], reverse=True)
+        # Match entities with semantic representation
+        for entity in entities:
+            for i in sorted(self._candidates(self._entity_idx, entity)):
+                if entity in self._ds_represents[i]:
+                    entry = scores[i]
+                    entry[0] += 2
+                    entry[1].append(('entity', entity))
+
+        # Check geometry type match; every entity naming a parcel/building or a
+        # transit stop adds one point to each dataset of the matching geometry
+        wants_polygon = [('parcel' in e or 'building' in e) for e in entities]
+        wants_point = [('transit' in e or 'stop' in e) for e in entities]
+        polygon_hits = sum(wants_polygon)
+        point_hits = sum(wants_point)
+        either_hits = sum(p or q for p, q in zip(wants_polygon, wants_point))
+
+        geometry_ids = set()
+        if polygon_hits:
+            geometry_ids |= self._polygon_ids
+        if point_hits:
+            geometry_ids |= self._point_ids
+        for i in sorted(geometry_ids):
+            is_polygon = i in self._polygon_ids
+            is_point = i in self._point_ids
+            hits = either_hits if is_polygon and is_point else polygon_hits if is_polygon else point_hits
+            entry = scores[i]
+            entry[0] += hits
+            entry[1].extend([('geometry', None)] * hits)
+
+        # Check capable tasks; repeated concepts cannot change a task's match
+        concepts_set = set(concepts)
+        task_ids = set()
+        for concept in concepts_set:
+            task_ids |= self._candidates(self._task_idx, concept)
+        if task_ids:
+            # One alternation scan finds whether any concept occurs in a task
+            concept_re = re.compile('|'.join(map(re.escape, concepts_set)))
+        for i in sorted(task_ids):
+            for task, task_lower in zip(self._ds_task_names[i], self._ds_tasks[i]):
+                if concept_re.search(task_lower):
+                    entry = scores[i]
+                    entry[0] += 1
+                    entry[1].append(('task', task))
+
+        # Select the top datasets by relevance, keeping knowledge base order between equal scores
+        top = heapq.nlargest(TOP_DATASETS, scores.items(), key=lambda item: (item[1][0], -item[0]))
+        relevant_datasets = [
+            {
+                'dataset': datasets[i],
+                'relevance_score': score,
+                'reasons': [REASON_FORMATS[kind].format(value) for kind, value in reasons]
+            }
+            for i, (score, reasons) in top
+        ]
 
         return relevant_datasets
 
-    def _generate_analysis_spec(self,
-                                original_query: str,
-                                parsed_query: Dict[str, Any],
-                                ontology_context: Dict[str, Any],
-                                relevant_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Generate final structured analysis specification"""
+    async def _generate_analysis_spec(self,
+                                      original_query: str,
+                                      parsed_query: Dict[str, Any],
+                                      ontology_context: Dict[str, Any],
+                                      relevant_data: List[Dict[str, Any]],
+                                      cache_dir: Optional[Path] = None,
+                                      spec_cache_file: Optional[Path] = None) -> Dict[str, Any]:
+        """Generate final structured analysis specification
+
+        Args:
+            cache_dir: Directory of cached workflows, keyed by prompt; None disables the disk cache
+            spec_cache_file: Where to cache the finished specification if its workflow was generated
+        """
 
         # Prepare context for LLM
         context = {
@@ -312,8 +750,7 @@ INTENT: <one sentence describing what they want>"""
                 {
                     'name': d['dataset']['file_name'],
                     'type': d['dataset']['data_type'],
-                    'relevance': d['relevance_score'],
-                    'reasons': d['reasons'][:2]
+                    'relevance': d['relevance_score']
                 }
                 for d in relevant_data[:5]
             ]
@@ -326,7 +763,7 @@ Query: {context['query']}
 Intent: {context['intent']}
 
 Available datasets:
-{json.dumps(context['available_datasets'], indent=2)}
+{orjson.dumps(context['available_datasets']).decode('utf-8')}
 
 Available analysis methods: {', '.join(context['available_methods'])}
 
@@ -337,36 +774,15 @@ Generate a detailed analysis workflow with:
 4. Any data gaps or limitations
 
 Format as JSON:
-{{
-  "steps": [
-    {{"step": 1, "operation": "...", "data_source": "...", "method": "..."}},
-    {{"step": 2, "operation": "...", "data_source": "...", "method": "..."}}
-  ],
-  "data_sufficiency": "sufficient/partial/insufficient",
-  "missing_data": ["..."],
-  "alternatives": "..."
-}}
+{WORKFLOW_SCHEMA}
 
 Provide only valid JSON, no additional text."""
 
         try:
-            response = ollama.chat(
-                model=self.model_name,
-                messages=[{'role': 'user', 'content': prompt}]
-            )
-
-            content = response['message']['content'].strip()
-
-            # Extract JSON from response
-            if '```json' in content:
-                content = content.split('```json')[1].split('```')[0].strip()
-            elif '```' in content:
-                content = content.split('```')[1].split('```')[0].strip()
-
-            workflow = json.loads(content)
-
+            workflow = await self._cached_workflow(prompt, cache_dir)
         except Exception as e:
             print(f"  Warning: Workflow generation failed - {str(e)}")
+            spec_cache_file = None
             workflow = {
                 'steps': [],
                 'data_sufficiency': 'unknown',
@@ -403,8 +819,97 @@ Provide only valid JSON, no additional text."""
             }
         }
 
+        if spec_cache_file is not None:
+            save_cached_json(spec_cache_file, analysis_spec)
+
         return analysis_spec
 
+    async def _cached_workflow(self, prompt: str, cache_dir: Optional[Path]) -> Dict[str, Any]:
+        """Ask the LLM for a workflow, reusing the parsed answer to an identical prompt"""
+        key = hashlib.blake2b(f"{self.model_name}|{prompt}".encode('utf-8'), digest_size=16).hexdigest()
+        if key in self._workflow_memo:
+            return self._workflow_memo[key]
+
+        cache_file = cache_dir / f"{key}.json" if cache_dir is not None else None
+        workflow = load_cached_json(cache_file) if cache_file is not None else None
+
+        if workflow is None:
+            content = await self._chat_json(prompt, format='json', options=self._workflow_options)
+            workflow = orjson.loads(content)
+
+            # Only answers that parsed are cached, so a failed call is retried next time
+            if cache_file is not None:
+                save_cached_json(cache_file, workflow)
+
+        self._workflow_memo[key] = workflow
+        return workflow
+
+    async def _chat(self, prompt: str, **kwargs) -> str:
+        """Send a user prompt to the model, bounded by the concurrency limit"""
+        async with self._semaphore:
+            response = await self.client.chat(
+                model=self.model_name,
+                messages=[{'role': 'user', 'content': prompt}],
+                think=self._think,
+                **kwargs
+            )
+        return response['message']['content']
+
+    async def _chat_json(self, prompt: str, **kwargs) -> str:
+        """
+        Stream a reply that should be a JSON object, stopping once the object closes
+
+        Closing the stream as soon as the top-level braces balance skips any
+        trailing commentary the model would still generate. Replies that do not
+        start with '{' are read in full.
+        """
+        parts = []
+        depth = 0
+        in_string = escaped = False
+        is_object = None
+
+        async with self._semaphore:
+            stream = await self.client.chat(
+                model=self.model_name,
+                messages=[{'role': 'user', 'content': prompt}],
+                stream=True,
+                think=self._think,
+                **kwargs
+            )
+            try:
+                async for chunk in stream:
+                    text = chunk['message']['content']
+                    if is_object is None and text.strip():
+                        is_object = text.lstrip()[0] == '{'
+                    if not is_object:
+                        parts.append(text)
+                        continue
+
+                    # Track brace depth outside of string literals
+                    for i, ch in enumerate(text):
+                        if in_string:
+                            if escaped:
+                                escaped = False
+                            elif ch == '\\':
+                                escaped = True
+                            elif ch == '"':
+                                in_string = False
+                        elif ch == '"':
+                            in_string = True
+                        elif ch == '{':
+                            depth += 1
+                        elif ch == '}':
+                            depth -= 1
+                            if depth == 0:
+                                parts.append(text[:i + 1])
+                                return ''.join(parts)
+                    parts.append(text)
+            finally:
+                # Dropping the connection stops generation on the server
+                await stream.aclose()
+
+        return ''.join(parts)
+
 
 def main():
     """Example usage"""
@@ -419,6 +924,9 @@ def main():
                        default='planning_ontology.ttl')
     parser.add_argument('-m', '--model', help='Ollama model name',
                        default='gpt-oss:20b')
+    parser.add_argument('-c', '--concurrency', type=int,
+                       help='Max concurrent LLM requests (match OLLAMA_NUM_PARALLEL)',
+                       default=4)
 
     args = parser.parse_args()
 
@@ -426,13 +934,13 @@ def main():
     print("Query Processing Agent (QP)")
     print("=" * 60)
 
-    qp = QueryProcessingAgent(
+    with QueryProcessingAgent(
         knowledge_base_file=args.knowledge_base,
         ontology_file=args.ontology,
-        model_name=args.model
-    )
-
-    analysis_spec = qp.process_query(args.query, args.output)
+        model_name=args.model,
+        concurrency=args.concurrency
+    ) as qp:
+        analysis_spec = qp.process_query(args.query, args.output)
 
     print("\n" + "=" * 60)
     print("Analysis Specification Generated")